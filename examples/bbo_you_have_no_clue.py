@@ -43,6 +43,16 @@ def do(deal):
             TABLE[i][j][imps(scorei, scorej)] += 1
 
 
+def result():
+    return TABLE
+
+
+def merge(result):
+    for line, result_line in zip(TABLE, result):
+        for counter, result_counter in zip(line, result_line):
+            counter.update(result_counter)
+
+
 def final(n_tries):
     for line in TABLE:
         print("\t".join(str(sum(list(counter.elements())) /
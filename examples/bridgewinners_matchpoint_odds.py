@@ -15,7 +15,7 @@ We also keep track of how often at least one game makes, regardless of whether
 it is reasonably easy to find.
 
 The following names will be imported from the simulation module: `predeal`,
-`initial`, `accept` `do` and `final`.
+`initial`, `accept` `do`, `final`, `result` and `merge`.
 """
 
 from redeal import *
@@ -68,14 +68,30 @@ def do(deal):
     print(deal, " ".join(str(scores[k]) for k in TABLE.entries))
     # Update the cross-matchpoint table.
     TABLE.add_data(scores)
-    # Keep track of how often at least one game makes.
-    if (deal.dd_tricks("4HN") >= 10 or deal.dd_tricks("4SN") >= 10
-            or deal.dd_tricks("3NN") >= 9):
+    # Keep track of how often at least one game makes.  `deal.dd_makes` only
+    # checks whether the contract makes, which is cheaper than counting tricks
+    # (when they have not been computed already).
+    if (deal.dd_makes("4HN") or deal.dd_makes("4SN")
+            or deal.dd_makes("3NN")):
         TABLE2[True] += 1
     else:
         TABLE2[False] += 1
 
 
+# `result` and `merge` are only needed when the simulation is split across
+# several processes (`--jobs`): `result` is called at the end of each worker
+# and returns its tables, which `merge` then adds to the main process's tables.
+def result():
+    return TABLE, TABLE2
+
+
+def merge(result):
+    table, table2 = result
+    TABLE.merge(table)
+    TABLE2[False] += table2[False]
+    TABLE2[True] += table2[True]
+
+
 # `final` is called at the end of the sim with the number of tries as an
 # argument.  Here it outputs the cross-matchpoint table and how often at least
 # one game makes.
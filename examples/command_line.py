@@ -0,0 +1,80 @@
+# Check the command-line modes that change where deals come from or go to:
+# writing deals (--output, --output-dd) and reading them back (--input), lazy
+# and parallel dealing (--lazy, --jobs), and exhaustive enumeration
+# (--enumerate, --spots).
+import contextlib
+import io
+import json
+import os
+import tempfile
+from redeal import Deal, Seat, Strain, corpus, pbn
+from redeal.__main__ import Main
+
+
+def run(*argv):
+    """Run redeal with the given arguments; return the lines it prints."""
+    main = Main()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        main.parse_args([str(arg) for arg in argv])
+        main.run()
+    return output.getvalue().splitlines()
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    # The default simulation prints each deal, then an empty line and the
+    # number of tries.
+    deals = run("-n", 20, "--seed", 1)[:-2]
+    assert len(deals) == 20
+    for ext in ["pbn", "jsonl", "bin"]:
+        path = os.path.join(tmpdir, f"deals.{ext}")
+        assert run("-n", 20, "--seed", 1, "--output", path,
+                   "--output-dd")[:-2] == deals
+        if ext == "jsonl":
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+            assert [record["board"] for record in records] == [*range(1, 21)]
+            assert all(len(record["dd"]) == 4 for record in records)
+            continue
+        assert run("--input", path)[:-2] == deals
+        # The stored double-dummy tables are reused instead of solved again.
+        assert run("--input", path, "--max", 5,
+                   "--do", "print(len(deal._dd_cache))")[:-2] == ["20"] * 5
+
+    # Input files are parsed in chunks, which must not split boards (and
+    # attach tables to the wrong deals), even when they end within boards.
+    dealer = Deal.prepare()
+    boards = [pbn.Board(None, None, None, dealer(),
+                        {(strain, seat): (idx + 4 * strain.value + seat.value)
+                         % 14 for strain in Strain for seat in Seat})
+              for idx in range(30)]
+    path = os.path.join(tmpdir, "tables.pbn")
+    pbn.write(path, boards)
+    for chunk_size, jobs in [*((size, 1) for size in range(1, 400, 7)),
+                             (100, 2), (333, 2)]:
+        assert [(deal, deal.dd_table())
+                for deal in corpus.read(path, jobs, chunk_size)] == [
+                    (board.deal, board.table) for board in boards]
+
+    # Deals written by parallel jobs are numbered and concatenated in order.
+    path = os.path.join(tmpdir, "jobs.pbn")
+    run("-n", 20, "-j", 2, "--seed", 1, "--do", "pass", "--output", path)
+    assert run("--input", path, "--do", "pass")[-1] == "Tries: 20"
+
+    lazy = run("-n", 5, "--seed", 1, "--lazy",
+               "--accept", "return deal.north.hcp >= 15",
+               "--do", "print(deal.north.hcp >= 15)")
+    assert lazy[:-2] == ["True"] * 5
+
+    # Only the four lowest clubs remain to be dealt, two to East and two to
+    # West: six deals, which are all equivalent when spots are ignored.
+    hands = ["-N", "AKQJ AKQ AKQ AKQ", "-S", "T987 JT9 JT9 JT9",
+             "-E", "6543 876 876 8", "-W", "2 5432 5432 76"]
+    assert run("--enumerate", *hands)[-1] == "Tries: 6"
+    script = os.path.join(tmpdir, "weights.py")
+    with open(script, "w") as file:
+        file.write("def do(deal, weight):\n"
+                   "    print(weight)\n")
+    assert run("--enumerate", "--spots", "8", *hands, script) == [
+        "6", "", "Tries: 6"]
+print("command line checks passed")
@@ -0,0 +1,21 @@
+# Measure the Python-side overhead of DDS calls: converting deals to DDS's
+# structs, and a cheap SolveBoard call (listing the valid leads).
+import timeit
+from redeal import Deal, Seat, Strain, dds
+
+
+dealer = Deal.prepare()
+deals = [dealer() for _ in range(1000)]
+new_deals = iter(deals)
+deal = deals[0]
+for name, func in [
+        ("dds.Deal.from_deal, new deal",
+         lambda: dds.Deal.from_deal(next(new_deals), Strain.S, Seat.E)),
+        ("dds.Deal.from_deal, same deal",
+         lambda: dds.Deal.from_deal(deal, Strain.S, Seat.E)),
+        ("dds.DDTableDeal.from_deal, same deal",
+         lambda: dds.DDTableDeal.from_deal(deal)),
+        ("dds.valid_cards", lambda: dds.valid_cards(deal, "S", "E")),
+]:
+    n = len(deals)
+    print(f"{name}: {timeit.timeit(func, number=n) / n * 1e6:.2f}us")
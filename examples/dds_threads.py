@@ -0,0 +1,41 @@
+# Check that solving deals concurrently, from several Python threads, gives the
+# same results as solving them serially.
+#
+# This only exercises several DDS thread slots if DDS was built with threading
+# support, which is the case on Windows; the POSIX builds (see setup.py) have a
+# single slot, through which all the calls are then serialized.
+from concurrent.futures import ThreadPoolExecutor
+import time
+from redeal import Deal, dds
+
+
+dealer = Deal.prepare()
+deals = [dealer() for _ in range(20)]
+contracts = ["3NN", "4SE", "4HS", "5DW", "5CN"]
+tasks = [(deal, contract) for deal in deals for contract in contracts]
+
+
+def solve(task):
+    deal, contract = task
+    return dds.solve(deal, contract[1], contract[2])
+
+
+start = time.perf_counter()
+serial = list(map(solve, tasks))
+serial_time = time.perf_counter() - start
+serial_tables = [dds.calc_dd_table(deal) for deal in deals[:10]]
+
+start = time.perf_counter()
+with ThreadPoolExecutor(8) as pool:
+    # Interleave calls that use DDS's own thread pool, which need all slots.
+    tables = [pool.submit(dds.calc_dd_table, deal) for deal in deals[:10]]
+    threaded = list(pool.map(solve, tasks))
+    tables = [table.result() for table in tables]
+threaded_time = time.perf_counter() - start
+
+assert threaded == serial
+assert tables == serial_tables
+print(f"{len(tasks)} boards with {dds.max_threads()} DDS thread slot(s): "
+      f"{serial_time:.3f}s (serial), {threaded_time:.3f}s (8 Python threads)")
+if dds.max_threads() == 1:
+    print("Single DDS thread slot: concurrent slot use was not tested.")
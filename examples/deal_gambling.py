@@ -34,6 +34,12 @@ _shapes = Counter()
 def do(deal):
     _shapes[deal.north.shape] += 1
 
+def result():
+    return _shapes
+
+def merge(result):
+    _shapes.update(result)
+
 def final(deal):
     for k, v in _shapes.most_common():
         print(" ".join(map(str, k)), ":", v)
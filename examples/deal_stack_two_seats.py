@@ -0,0 +1,17 @@
+"""
+Smartstacking two seats at once:
+
+North opens a strong notrump (balanced, 15-17HCP) and South holds both
+majors, at least 5-5, with 5-9HCP.
+
+Both hands are dealt jointly, uniformly among the hands satisfying both
+constraints; the rest of the cards are dealt normally.
+"""
+
+from redeal import *
+
+balanced = Shape("(4333)") + Shape("(4432)") + Shape("(5332)")
+majors = Shape("55xx") + Shape("65xx") + Shape("56xx")
+
+predeal = {"N": SmartStack(balanced, Evaluator(4, 3, 2, 1), range(15, 18)),
+           "S": SmartStack(majors, Evaluator(4, 3, 2, 1), range(5, 10))}
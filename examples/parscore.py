@@ -1,4 +1,5 @@
 import re
+import time
 from redeal import Deal
 
 
@@ -506,10 +507,20 @@ test_cases = [
 ]
 
 
+python_time = native_time = 0
 for idx, (predeal, dealer, nsvul, ewvul, score) in enumerate(test_cases):
     deal = Deal.prepare({
         k: re.sub(" (?= )", " -", f" {v} ")[1:-1]  # Sanitize voids.
         for k, v in predeal.items()})()
+    deal.dd_table()  # Solve once, so that only the par computation is timed.
+    start = time.perf_counter()
     pars = deal.par(dealer, nsvul, ewvul)
+    python_time += time.perf_counter() - start
+    start = time.perf_counter()
+    native_pars = deal.par(dealer, nsvul, ewvul, native=True)
+    native_time += time.perf_counter() - start
     assert pars[0].score == score
+    assert list(map(str, pars)) == list(map(str, native_pars))
     print(f"test #{idx+1}/{len(test_cases)} passed", end="\r")
+print(f"\npar computation for {len(test_cases)} deals: "
+      f"{python_time:.3f}s (Python), {native_time:.3f}s (DDS)")
@@ -24,5 +24,14 @@ def do(d):
     table[d.south.hcp] += 1
 
 
+def result():
+    return table
+
+
+def merge(result):
+    for hcp, count in result.items():
+        table[hcp] += count
+
+
 def final(_):
     print(table)
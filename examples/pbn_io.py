@@ -0,0 +1,53 @@
+# Benchmark reading and writing PBN files with redeal.pbn.
+import os
+import tempfile
+import time
+from redeal import Deal, Seat, Strain, pbn
+
+try:
+    import numpy  # Only needed for pbn.read_arrays.
+except ImportError:
+    numpy = None
+
+
+BOARDS = 1000  # Use 1000000 for the full-size benchmark.
+
+dealer = Deal.prepare()
+deals = [dealer() for _ in range(BOARDS)]
+with tempfile.TemporaryDirectory() as tmpdir:
+    path = os.path.join(tmpdir, "deals.pbn")
+    start = time.perf_counter()
+    pbn.write(path, deals)
+    write_time = time.perf_counter() - start
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    boards = list(pbn.read(path))
+    read_time = time.perf_counter() - start
+    if numpy is not None:
+        start = time.perf_counter()
+        arrays = pbn.read_arrays(path)
+        read_arrays_time = time.perf_counter() - start
+    # Check that files are split into chunks between boards, even when the
+    # chunks are small enough to end within boards (and their tables) and
+    # right before line ends.
+    tables = [{(strain, seat): (idx + 4 * strain.value + seat.value) % 14
+               for strain in Strain for seat in Seat}
+              for idx in range(50)]
+    pbn.write(path, [pbn.Board(None, None, None, deal, table)
+                     for deal, table in zip(deals, tables)])
+    for chunk_size in range(1, 500, 3):
+        with open(path) as file:
+            chunked = [pbn._to_board(parsed)
+                       for chunk in pbn._chunks(file, chunk_size)
+                       for parsed in pbn._parse_boards(chunk)]
+        assert [(board.board, board.deal, board.table)
+                for board in chunked] == [
+                    (idx, deal, table)
+                    for idx, (deal, table) in enumerate(zip(deals, tables), 1)]
+assert [board.deal for board in boards] == deals
+print(f"{BOARDS} boards ({size / 2 ** 20:.1f} MiB): "
+      f"write {write_time:.2f}s, read {read_time:.2f}s", end="")
+if numpy is not None:
+    assert len(arrays.masks) == BOARDS
+    print(f", read_arrays {read_arrays_time:.2f}s", end="")
+print()
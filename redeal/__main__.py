@@ -1,10 +1,15 @@
 import argparse
 from argparse import Namespace
+import contextlib
 import inspect
+import itertools
+import multiprocessing
+import os
 import random
 import runpy
+import sys
 
-from . import global_defs, redeal, util
+from . import corpus, global_defs, output, redeal, util
 
 
 class Main:
@@ -19,6 +24,30 @@ class Main:
     parser.add_argument(
         "--max", type=int,
         help="the maximum number of tries (defaults to 1000*n)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="the number of worker processes")
+    parser.add_argument(
+        "--enumerate", action="store_true",
+        help="deal every completion of the predealt hands once, instead of "
+        "random deals (-n, --max and --jobs are ignored)")
+    parser.add_argument(
+        "--spots", choices=[rank.name for rank in global_defs.Rank],
+        help="with --enumerate, consider the remaining cards ranked SPOTS or "
+        "lower equivalent, dealing each distribution of them once; the "
+        "number of deals each deal stands for is passed to do as its weight "
+        "argument, which it must take")
+    parser.add_argument(
+        "--lazy", action="store_true",
+        help="only deal each hand when the accept function first looks at "
+        "it, which is faster when most deals are rejected early (deals "
+        "differ from those of the default mode for a given seed)")
+    parser.add_argument(
+        "--input", metavar="PATH",
+        help="process the deals read from PATH (in PBN, LIN or binary format, "
+        "depending on its extension: .pbn, .lin or .bin) instead of random "
+        "deals; -n is ignored, --max limits the number of deals read, and "
+        "--jobs sets the number of parsing processes")
     parser.add_argument(
         "-f", "--format", choices=["short", "long", "pbn"],
         default="short", help="set diagram print style")
@@ -32,6 +61,17 @@ class Main:
     parser.add_argument(
         "--seed", type=int,
         help="random number generator seed")
+    parser.add_argument(
+        "--dd-cache", metavar="PATH",
+        help="store double-dummy results in (and reuse them from) a SQLite "
+        "database")
+    parser.add_argument(
+        "--output", metavar="PATH",
+        help="write the accepted deals to PATH, in PBN, JSON Lines or binary "
+        "format depending on its extension (.pbn, .jsonl or .bin)")
+    parser.add_argument(
+        "--output-dd", action="store_true",
+        help="also write the double-dummy table of each deal to --output")
     parser.add_argument(
         "script", nargs="?",
         help="path to script")
@@ -72,13 +112,20 @@ class Main:
 
     def __init__(self):
         self.stop_flag = False
-        self.args = Namespace(n=10, max=None, verbose=False)
+        self.argv = []
+        self.args = Namespace(
+            n=10, max=None, jobs=1, enumerate=False, spots=None, input=None,
+            lazy=False, verbose=False, output=None, output_dd=False)
+        self.writer = None
 
     def parse_args(self, argv=None):
         """Parse command line args."""
-        self.args = self.parser.parse_args(argv)
+        self.argv = sys.argv[1:] if argv is None else argv
+        self.args = self.parser.parse_args(self.argv)
 
         random.seed(self.args.seed)
+        if self.args.dd_cache:
+            redeal.Deal.set_dd_cache(path=self.args.dd_cache)
 
         if self.args.script is None:
             self.script_dict = {}
@@ -123,30 +170,161 @@ class Main:
 
     def generate(self, simulation):
         """Repeatedly generate and process deals until enough are accepted."""
-        found = 0
         dealer = redeal.Deal.prepare(self.predeal)
+        self.initial(simulation, dealer)
+        n = self.args.n
+        max_tries = self.args.max or 1000 * n
+        if self.args.input:
+            deals = corpus.read(self.args.input, self.args.jobs)
+            try:
+                with self.writing():
+                    _, tries = self.process(
+                        simulation, itertools.islice(deals, self.args.max))
+            finally:
+                deals.close()
+        elif self.args.enumerate:
+            spots = (global_defs.Rank[self.args.spots]
+                     if self.args.spots else None)
+            # Without --spots, all weights are 1 and can be dropped.
+            if spots is not None and not _takes_weight(simulation):
+                self.parser.error(
+                    "--spots requires the simulation's do to take a weight "
+                    "argument, so that results remain exact")
+            with self.writing():
+                _, tries = self.process(
+                    simulation, dealer.enumerate(spots), weighted=True)
+        elif self.args.jobs > 1:
+            # Results accumulated by the workers are lost unless they can be
+            # passed back and merged; only the default final ignores them.
+            if (not _overrides(simulation, "result", "merge")
+                    and _overrides(simulation, "final")):
+                self.parser.error(
+                    "--jobs > 1 requires the simulation to define result and "
+                    "merge, so that the workers' results can be combined")
+            # Each job handles a (reproducible) share of the deals and tries,
+            # and the partial results are merged in job order.  Jobs write
+            # their deals to separate files, which are then concatenated;
+            # boards are numbered as if each job found all its deals.
+            rng = random.Random(self.args.seed)
+            jobs = []
+            first_board = 1
+            for k in range(self.args.jobs):
+                job_n, job_max_tries = (
+                    total // self.args.jobs + (k < total % self.args.jobs)
+                    for total in [n, max_tries])
+                jobs.append((self.argv, rng.getrandbits(64), job_n,
+                             job_max_tries, k, first_board))
+                first_board += job_n
+            with multiprocessing.Pool(self.args.jobs) as pool:
+                tries = 0
+                for result, job_tries in pool.starmap(_run_job, jobs):
+                    simulation.merge(result)
+                    tries += job_tries
+            if self.args.output:
+                output.concatenate(
+                    self.args.output,
+                    [_part_path(self.args.output, k)
+                     for k in range(self.args.jobs)])
+        else:
+            with self.writing():
+                _, tries = self.process(
+                    simulation, self.random_deals(dealer, max_tries), n)
+        print()
+        simulation.final(tries)
+
+    def initial(self, simulation, dealer):
+        """Call the simulation's initial function."""
         try:
             inspect.signature(simulation.initial).bind(dealer)
         except TypeError:
             simulation.initial()
         else:
             simulation.initial(dealer)
-        for i in range(self.args.max or 1000 * self.args.n):
-            if self.stop_flag:
+
+    @contextlib.contextmanager
+    def writing(self, path=None, first_board=1):
+        """
+        Write the accepted deals to *path* (defaulting to --output, if given)
+        while in the context.
+        """
+        path = path or self.args.output
+        if not path:
+            yield
+            return
+        with output.DealWriter(
+                path, self.args.output_dd, first_board) as self.writer:
+            try:
+                yield
+            finally:
+                self.writer = None
+
+    def random_deals(self, dealer, n):
+        """Generate *n* random deals (`LazyDeal`\\s if --lazy is set)."""
+        deal = dealer.lazy if self.args.lazy else dealer
+        return (deal() for _ in range(n))
+
+    def process(self, simulation, deals, n=None, weighted=False):
+        """
+        Process deals from the *deals* iterable until *n* are accepted (if
+        given) or *deals* is exhausted; return the numbers of accepted deals
+        and of tries.
+
+        If *weighted* is set, *deals* yields ``(deal, weight)`` pairs (see
+        `Dealer.enumerate`): each deal counts as *weight* tries, and the weight
+        is passed to the simulation's do function, if it takes it.
+        """
+        found = tries = 0
+        deals = iter(deals)
+        pass_weight = weighted and _takes_weight(simulation)
+        weight = 1
+        while found != n and not self.stop_flag:
+            deal = next(deals, None)
+            if deal is None:
                 break
-            deal = dealer()
+            if weighted:
+                deal, weight = deal
+            tries += weight
             if simulation.accept(deal):
+                if isinstance(deal, redeal.LazyDeal):
+                    deal = deal.force()
                 found += 1
-                simulation.do(deal)
+                if pass_weight:
+                    simulation.do(deal, weight)
+                else:
+                    simulation.do(deal)
+                if self.writer:
+                    self.writer.write(deal)
                 if self.args.verbose:
                     progress = ("(hand #{}, found after {} tries)".
-                                format(found, i + 1))
+                                format(found, tries))
                     print(progress, end="\r", flush=True)
                     print(" " * len(progress) + "\b" * len(progress), end="")
-            if found >= self.args.n:
-                break
-        print()
-        simulation.final(i + 1)
+        return found, tries
+
+    def create_simulation(self):
+        """Get the script's simulation, or build it from the given funcs."""
+        try:
+            return self.verbose_get("simulation")
+        except LookupError:
+            # Functions left to their defaults are inherited, so that
+            # overridden ones can be told apart (see `_overrides`).
+            funcs = {name: util.create_func(redeal, name, signature_str, body)
+                     for (name, signature_str, body), (_, _, default)
+                     in zip(self.given_funcs, self.func_defaults)
+                     if body is not default}
+            # Reduction functions can only be given in the script.
+            funcs.update({
+                name: util.create_func(redeal, name, None, func)
+                for name, func in self.script_dict.items()
+                if name in ["result", "merge"]})
+            return type(str(), (redeal.Simulation,), funcs)()
+
+    def set_str_styles(self):
+        """Set the output styles of hands and deals."""
+        redeal.Hand.set_str_style(self.args.format)
+        redeal.Deal.set_str_style(self.args.format)
+        redeal.Deal.set_print_only(
+            [global_defs.Seat[seat] for seat in self.args.only])
 
     def run(self):
         """Start a GUI or run a simulation."""
@@ -154,20 +332,51 @@ class Main:
             from . import gui  # Not needed otherwise, and absent on CI.
             gui.run_gui(self)
         else:
-            try:
-                simulation = self.verbose_get("simulation")
-            except LookupError:
-                simulation = type(
-                    str(), (redeal.Simulation,),
-                    {name: util.create_func(redeal, name, signature_str, body)
-                     for name, signature_str, body in self.given_funcs})()
-            redeal.Hand.set_str_style(self.args.format)
-            redeal.Deal.set_str_style(self.args.format)
-            redeal.Deal.set_print_only(
-                [global_defs.Seat[seat] for seat in self.args.only])
+            simulation = self.create_simulation()
+            self.set_str_styles()
             self.generate(simulation)
 
 
+def _overrides(simulation, *names):
+    """Return whether *simulation* overrides all the given functions."""
+    return all(getattr(type(simulation), name)
+               is not getattr(redeal.Simulation, name)
+               for name in names)
+
+
+def _takes_weight(simulation):
+    """Return whether the simulation's do takes a weight argument."""
+    try:
+        inspect.signature(simulation.do).bind(None, 1)
+    except TypeError:
+        return False
+    return True
+
+
+def _part_path(path, k):
+    """Return the path to which job #k writes its share of --output."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{k}{ext}"
+
+
+def _run_job(argv, seed, n, max_tries, k, first_board):
+    """Run a share of a simulation (job #k) in a worker process."""
+    main = Main()
+    main.parse_args(argv)
+    main.args.verbose = False  # Progress reports would be interleaved.
+    random.seed(seed)
+    simulation = main.create_simulation()
+    main.set_str_styles()
+    dealer = redeal.Deal.prepare(main.predeal)
+    main.initial(simulation, dealer)
+    with main.writing(main.args.output and _part_path(main.args.output, k),
+                      first_board):
+        _, tries = main.process(
+            simulation, main.random_deals(dealer, max_tries), n)
+    sys.stdout.flush()  # The pool may terminate the worker before exit.
+    return simulation.result(), tries
+
+
 def console_entry():
     main = Main()
     main.parse_args()
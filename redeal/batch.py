@@ -0,0 +1,155 @@
+"""
+Column-oriented evaluation of batches of deals; requires NumPy.
+
+For example, ::
+
+    dealer = Deal.prepare()
+    deals = Deals(dealer.batch(100000))
+    selected = deals[(deals.north.hcp >= 20) & balanced(deals.north)]
+
+evaluates the conditions over the whole batch at once, and only the selected
+deals are converted to `Deal` objects, when iterating over them.
+"""
+
+import numpy as np
+
+from .global_defs import Rank, Seat, Suit
+from .redeal import Deal, Evaluator, Holding, Shape
+
+
+_holding_tables = {}
+_shape_tables = {}
+
+
+def _holding_table(func):
+    """Return the values of *func* over all holdings, indexed by mask."""
+    try:
+        return _holding_tables[func]
+    except KeyError:
+        table = _holding_tables[func] = np.array(
+            func.table if isinstance(func, Evaluator)
+            else Evaluator.from_func(func).table)
+        return table
+
+
+def _shape_table(shape):
+    """Return whether each shape is included, indexed by (s, h, d) lengths."""
+    try:
+        return _shape_tables[shape]
+    except KeyError:
+        table = _shape_tables[shape] = np.zeros(
+            (len(Rank) + 1,) * (len(Suit) - 1), bool)
+        for idx, (s, h, d, c) in enumerate(Shape._all_shapes):
+            table[s, h, d] = shape._table[idx]
+        return table
+
+
+_LENGTHS = _holding_table(len)
+
+
+class Deals:
+    """A batch of deals, represented as a ``(n, 4, 4)`` array of suit masks."""
+
+    def __init__(self, masks):
+        """Initialize with an array such as returned by `Dealer.batch`."""
+        self.masks = np.asarray(masks, np.uint16)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __getitem__(self, selector):
+        """Select deals, e.g. using a boolean array."""
+        return Deals(self.masks[selector])
+
+    def __iter__(self):
+        """Iterate over the deals, as `Deal` objects."""
+        return map(Deal.from_masks, self.masks)
+
+    north = property(lambda self: Hands(self.masks[:, Seat.N]), "north")
+    east = property(lambda self: Hands(self.masks[:, Seat.E]), "east")
+    south = property(lambda self: Hands(self.masks[:, Seat.S]), "south")
+    west = property(lambda self: Hands(self.masks[:, Seat.W]), "west")
+
+
+class Hands:
+    """A column of hands, represented as a ``(n, 4)`` array of suit masks."""
+
+    def __init__(self, masks):
+        self.masks = masks
+
+    spades = property(lambda self: Holdings(self.masks[:, Suit.S]),
+                      doc="The hands' spades.")
+    hearts = property(lambda self: Holdings(self.masks[:, Suit.H]),
+                      doc="The hands' hearts.")
+    diamonds = property(lambda self: Holdings(self.masks[:, Suit.D]),
+                        doc="The hands' diamonds.")
+    clubs = property(lambda self: Holdings(self.masks[:, Suit.C]),
+                     doc="The hands' clubs.")
+
+    @property
+    def shape(self):
+        """The hands' shapes, as a ``(n, 4)`` array of lengths."""
+        return Shapes(_LENGTHS[self.masks])
+
+    def evaluate(self, func):
+        """Sum a holding evaluation function over the hands' four suits."""
+        return _holding_table(func)[self.masks].sum(axis=1)
+
+    hcp = property(lambda self: self.evaluate(Holding.hcp.wrapped),
+                   doc="The hands' HCP count.")
+    qp = property(lambda self: self.evaluate(Holding.qp.wrapped),
+                  doc="The hands' QP count.")
+    controls = property(lambda self: self.evaluate(Holding.controls.wrapped),
+                        doc="The hands' control count.")
+    losers = property(lambda self: self.evaluate(Holding.losers.wrapped),
+                      doc="The hands' loser count.")
+    newltc = property(lambda self: self.evaluate(Holding.newltc.wrapped),
+                      doc="The hands' loser count.")
+    pt = property(lambda self: self.evaluate(Holding.pt.wrapped),
+                  doc="The hands' playing tricks.")
+
+
+class Holdings:
+    """A column of holdings, represented as a ``(n,)`` array of masks."""
+
+    def __init__(self, masks):
+        self.masks = masks
+
+    @property
+    def len(self):
+        """The holdings' lengths."""
+        return _LENGTHS[self.masks]
+
+    def has(self, rank):
+        """Check whether the holdings contain a given rank."""
+        return (self.masks >> (rank.value - 2) & 1).astype(bool)
+
+    def evaluate(self, func):
+        """Evaluate a holding evaluation function over the holdings."""
+        return _holding_table(func)[self.masks]
+
+    hcp = property(lambda self: self.evaluate(Holding.hcp.wrapped),
+                   doc="The holdings' HCP.")
+    qp = property(lambda self: self.evaluate(Holding.qp.wrapped),
+                  doc="The holdings' QP.")
+    controls = property(lambda self: self.evaluate(Holding.controls.wrapped),
+                        doc="The holdings' control count.")
+    losers = property(lambda self: self.evaluate(Holding.losers.wrapped),
+                      doc="The holdings' loser count.")
+    newltc = property(lambda self: self.evaluate(Holding.newltc.wrapped),
+                      doc="The holdings' new losing trick count.")
+    pt = property(lambda self: self.evaluate(Holding.pt.wrapped),
+                  doc="The holdings' playing tricks.")
+
+
+class Shapes:
+    """A column of shapes, represented as a ``(n, 4)`` array of lengths."""
+
+    def __init__(self, lengths):
+        self.lengths = lengths
+
+    def isin(self, shape):
+        """Check whether the shapes are included in a `Shape`."""
+        return _shape_table(shape)[
+            self.lengths[:, Suit.S], self.lengths[:, Suit.H],
+            self.lengths[:, Suit.D]]
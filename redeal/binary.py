@@ -0,0 +1,195 @@
+"""
+A compact binary format for sets of deals.
+
+A file starts with an 8-byte header: the magic string ``b"REDEAL"``, the
+format version, and flags (bit 0 set if double-dummy tables are included).
+Each deal is then stored as a fixed-size record:
+
+- 13 bytes holding the seat of each card, as 2-bit numbers (0=N, 1=E, 2=S,
+  3=W), least significant bits first.  Card #i is the card whose bit is set in
+  `Hand.bits` (i.e., cards are ordered by suit, spades first, then by rank,
+  two first).
+- If the file includes double-dummy tables, 20 bytes holding declarer's
+  number of tricks for each strain (clubs first, notrump last) and declarer
+  (north first).
+
+`Reader` gives random access to the deals of a file, which is memory-mapped
+(so that even very large files can be read at disk speed): individual deals as
+`Deal` objects, or ranges of deals as NumPy arrays, e.g. to be wrapped in
+`redeal.batch.Deals`.
+"""
+
+import mmap
+import struct
+
+from .global_defs import _ALL_CARDS, Seat, Strain, Suit
+from .redeal import Deal
+
+
+MAGIC = b"REDEAL"
+VERSION = 1
+HAS_DD = 1
+DEAL_SIZE = 13
+DD_SIZE = len(Strain) * len(Seat)
+_header = struct.Struct("<6sBB")
+HEADER_SIZE = _header.size
+# Each 13-bit mask with a zero bit inserted above each bit.
+_SPREAD = [sum((mask >> i & 1) << 2 * i for i in range(13))
+           for mask in range(1 << 13)]
+_UNSPREAD = {spread: mask for mask, spread in enumerate(_SPREAD)}
+_EVEN_BITS = _SPREAD[0x1fff] * (1 + (1 << 26) + (1 << 52) + (1 << 78))
+
+
+def pack_header(dd=False):
+    """Return the file header."""
+    return _header.pack(MAGIC, VERSION, HAS_DD if dd else 0)
+
+
+def record_size(dd=False):
+    """Return the size of a record."""
+    return DEAL_SIZE + (DD_SIZE if dd else 0)
+
+
+def _spread(bits):
+    return (_SPREAD[bits & 0x1fff]
+            | _SPREAD[bits >> 13 & 0x1fff] << 26
+            | _SPREAD[bits >> 26 & 0x1fff] << 52
+            | _SPREAD[bits >> 39] << 78)
+
+
+def _unspread(spread):
+    return (_UNSPREAD[spread & 0x3ffffff]
+            | _UNSPREAD[spread >> 26 & 0x3ffffff] << 13
+            | _UNSPREAD[spread >> 52 & 0x3ffffff] << 26
+            | _UNSPREAD[spread >> 78] << 39)
+
+
+def pack_deal(deal, table=None):
+    """
+    Return the record of a deal.
+
+    *table*, if given, is a ``(strain, declarer) -> tricks`` dict, as returned
+    by `Deal.dd_table`.
+    """
+    north, east, south, west = (hand.bits for hand in deal)
+    record = (_spread(east | west) | _spread(south | west) << 1).to_bytes(
+        DEAL_SIZE, "little")
+    if table is not None:
+        record += bytes(table[strain, seat]
+                        for strain in Strain for seat in Seat)
+    return record
+
+
+def unpack_deal(record):
+    """Return the `Deal` of a record (the double-dummy table is ignored)."""
+    seats = int.from_bytes(record[:DEAL_SIZE], "little")
+    low = _unspread(seats & _EVEN_BITS)
+    high = _unspread(seats >> 1 & _EVEN_BITS)
+    return Deal.from_bits([_ALL_CARDS & ~(low | high), low & ~high,
+                           high & ~low, low & high])
+
+
+def unpack_table(record):
+    """Return the double-dummy table of a record, or None if it has none."""
+    if len(record) < DEAL_SIZE + DD_SIZE:
+        return None
+    tricks = iter(record[DEAL_SIZE:DEAL_SIZE + DD_SIZE])
+    return {(strain, seat): next(tricks) for strain in Strain for seat in Seat}
+
+
+class Reader:
+    """
+    A memory-mapped reader of a binary deal file.
+
+    Deals can be accessed by index (``reader[i]``) or iterated over; they are
+    only decoded when accessed.  Double-dummy tables included in the file are
+    loaded into the deals' own caches, so that `Deal.dd_tricks`,
+    `Deal.dd_table`, etc. do not need to solve them again.  Use as a context
+    manager, or call `close` when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if not file.seek(0, 2):  # mmap does not support empty files.
+                raise Exception(f"Invalid binary deal file: {path}")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags = _header.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f"Invalid binary deal file: {path}")
+        self.dd = bool(flags & HAS_DD)
+        self.record_size = record_size(self.dd)
+        self._n, extra = divmod(
+            len(self._mmap) - HEADER_SIZE, self.record_size)
+        if extra:
+            raise Exception(f"Truncated binary deal file: {path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, idx):
+        """Return the deal at index *idx*."""
+        record = self.record(idx)
+        deal = unpack_deal(record)
+        if self.dd:
+            deal._dd_cache.update(
+                ((strain.name, seat.name), tricks)
+                for (strain, seat), tricks in unpack_table(record).items())
+        return deal
+
+    def __iter__(self):
+        for idx in range(self._n):
+            yield self[idx]
+
+    def record(self, idx):
+        """Return the raw record at index *idx*."""
+        if idx < 0:
+            idx += self._n
+        if not 0 <= idx < self._n:
+            raise IndexError("Deal index out of range")
+        start = HEADER_SIZE + idx * self.record_size
+        return self._mmap[start:start + self.record_size]
+
+    def _records(self, start, stop):
+        import numpy as np  # Only needed for bulk access.
+        start, stop, _ = slice(start, stop).indices(self._n)
+        return np.frombuffer(
+            self._mmap, np.uint8, max(stop - start, 0) * self.record_size,
+            HEADER_SIZE + start * self.record_size).reshape(
+                -1, self.record_size)
+
+    def masks(self, start=0, stop=None):
+        """
+        Return the deals from index *start* to *stop* as a ``(n, 4, 4)``
+        array of suit masks (indexed by deal, seat and suit, as returned by
+        `Dealer.batch`); requires NumPy.
+        """
+        import numpy as np
+        records = self._records(start, stop)
+        # seats[i, suit, rank]: the seat holding the card.
+        seats = (records[:, :DEAL_SIZE, None] >> np.arange(0, 8, 2)
+                 & 3).reshape(-1, len(Suit), DEAL_SIZE)
+        bits = (1 << np.arange(DEAL_SIZE)).astype(np.uint16)
+        return np.stack(
+            [((seats == seat) * bits).sum(axis=2, dtype=np.uint16)
+             for seat in range(len(Seat))], axis=1)
+
+    def dd_tables(self, start=0, stop=None):
+        """
+        Return the double-dummy tables of the deals from index *start* to
+        *stop* as a ``(n, 5, 4)`` array of declarer's tricks, indexed by deal,
+        strain (clubs first) and declarer; requires NumPy.
+        """
+        if not self.dd:
+            raise Exception(f"{self.path} has no double-dummy tables")
+        return self._records(start, stop)[:, DEAL_SIZE:].reshape(
+            -1, len(Strain), len(Seat)).copy()
@@ -0,0 +1,103 @@
+"""
+Reading deals from files, in PBN, LIN or binary format (see `read`).
+
+Text files are split into chunks (see `pbn._chunks`), which can be parsed in
+parallel by worker processes; the deals are then yielded in file order.
+"""
+
+from collections import deque
+import multiprocessing
+import os
+import re
+
+from . import binary, pbn
+from .global_defs import _ALL_CARDS, Seat, Suit
+
+_LIN_DEAL = re.compile(r"md\|(\d?)([^|]*)\|")
+_LIN_SUITS = re.compile(r"([SHDC])([^SHDC]*)")
+# LIN hands are given starting from South.
+_LIN_SEATS = [Seat.S, Seat.W, Seat.N, Seat.E]
+
+
+def _lin_deal(deal):
+    hands = deal.upper().split(",")
+    if len(hands) < len(Seat) - 1:
+        raise Exception(f"Invalid LIN deal: {deal}")
+    all_bits = [None] * len(Seat)
+    for seat, hand in zip(_LIN_SEATS, hands):
+        if not hand and seat == _LIN_SEATS[-1]:
+            continue  # The last hand may be omitted.
+        bits = 0
+        for suit, ranks in _LIN_SUITS.findall(hand):
+            for rank in ranks:
+                try:
+                    bits |= 1 << (13 * Suit[suit].value
+                                  + pbn._RANKS.index(rank))
+                except ValueError:
+                    raise Exception(f"Invalid LIN deal: {deal}") from None
+        all_bits[seat.value] = bits
+    if all_bits[Seat.E.value] is None:
+        all_bits[Seat.E.value] = _ALL_CARDS & ~sum(
+            bits for bits in all_bits if bits is not None)
+    if not (sum(all_bits) == _ALL_CARDS
+            and all_bits[0] | all_bits[1] | all_bits[2] | all_bits[3]
+            == _ALL_CARDS):
+        raise Exception(f"Invalid or incomplete LIN deal: {deal}")
+    return all_bits
+
+
+def _parse_lin(text):
+    """Parse the deals in *text*, as `pbn._parse_boards`."""
+    return [(None, None, None, _lin_deal(match[2]), None)
+            for match in _LIN_DEAL.finditer(text)]
+
+
+_PARSERS = {"pbn": pbn._parse_boards, "lin": _parse_lin}
+
+
+def _parse_chunk(ext, text):
+    """Parse a chunk of a text file, as `pbn._parse_boards`."""
+    return _PARSERS[ext](text)
+
+
+def _to_deal(parsed):
+    return pbn._to_board(parsed).deal
+
+
+def read(path, jobs=1, chunk_size=1 << 22):
+    """
+    Iterate over the deals of a file, in PBN (``.pbn``), LIN (``.lin``) or
+    binary (``.bin``, see `redeal.binary`) format, according to its
+    extension.
+
+    Text files are parsed by *jobs* worker processes, in chunks of about
+    *chunk_size* characters.  In PBN files, only the Deal and
+    OptimumResultTable tags are used (double-dummy tables are stored in the
+    deals' caches, as for binary files); in LIN files, only the ``md`` fields.
+    """
+    ext = os.path.splitext(path)[1][1:].lower()
+    if ext == "bin":
+        with binary.Reader(path) as reader:
+            yield from reader
+        return
+    if ext not in _PARSERS:
+        raise Exception(
+            f"Unsupported input format: {path} (the extension must be .pbn, "
+            f".lin or .bin)")
+    with open(path, encoding="utf-8", errors="replace") as file:
+        # PBN boards span several lines, LIN deals a single one.
+        chunks = pbn._chunks(file, chunk_size, by_line=ext == "lin")
+        if jobs > 1:
+            with multiprocessing.Pool(jobs) as pool:
+                # Only parse a few chunks in advance, to bound memory use.
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(
+                        pool.apply_async(_parse_chunk, (ext, chunk)))
+                    if len(pending) > 2 * jobs:
+                        yield from map(_to_deal, pending.popleft().get())
+                while pending:
+                    yield from map(_to_deal, pending.popleft().get())
+        else:
+            for chunk in chunks:
+                yield from map(_to_deal, _parse_chunk(ext, chunk))
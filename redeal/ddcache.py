@@ -0,0 +1,158 @@
+"""
+Process-wide cache of double-dummy results.
+
+Results are keyed by a canonical form of the deal, which is shared by deals
+that have the same double-dummy results:
+
+- seats are numbered relative to the declarer (or leader), and
+- suits are sorted (except for the trump suit, which comes first), as
+  permuting suits other than trumps does not change the results.
+
+Optionally, spot cards (the cards ranked at most `DDCache.spots`) can be
+considered equivalent within each suit, in which case only the number of such
+cards held by each seat is part of the key.  This is an approximation, as
+small cards can matter, but it can greatly increase the hit rate.
+
+Results can also be persisted to a SQLite database (`DDCache.path`), so that
+reruns of a simulation (with the same seed, or after a crash) do not solve
+the same deals again.
+"""
+
+import ast
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+
+from .global_defs import Card, Seat, Suit
+
+
+class DDCache:
+    """A bounded (least-recently-used) cache of double-dummy results."""
+
+    def __init__(self, maxsize=2 ** 16, spots=None, path=None):
+        self.maxsize = maxsize
+        self.spots = spots
+        self.path = path
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Per-thread database connections.
+
+    def clear(self):
+        """Empty the in-memory cache (the database, if any, is kept)."""
+        with self._lock:
+            self._data.clear()
+        self.hits = self.misses = 0
+
+    def _connection(self):
+        """Return a connection to the database at `path`, or None."""
+        if self.path is None:
+            return None
+        # Connections cannot be shared with other threads, nor with forked
+        # (worker) processes.
+        local = self._local
+        if getattr(local, "key", None) != (os.getpid(), self.path):
+            local.db = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None)
+            local.db.execute("PRAGMA journal_mode = WAL")
+            local.db.execute("CREATE TABLE IF NOT EXISTS results "
+                             "(key TEXT PRIMARY KEY, value TEXT)")
+            local.key = os.getpid(), self.path
+        return local.db
+
+    def _canonical(self, deal, strain, seat):
+        """
+        Return the canonical form of *deal* for *strain* and *seat* (given by
+        name), and the actual suits in canonical order.
+        """
+        seat = Seat[seat].value
+        low = (1 << (self.spots.value - 1)) - 1 if self.spots else 0
+        hands = [deal[(seat + k) % len(Seat)].masks for k in range(len(Seat))]
+        codes = []
+        for suit in Suit:
+            masks = [hand[suit] for hand in hands]
+            codes.append(
+                (*(mask & ~low for mask in masks),
+                 *(bin(mask & low).count("1") for mask in masks))
+                if low else tuple(masks))
+        if strain == "N":
+            suits = sorted(Suit, key=codes.__getitem__)
+        else:
+            trumps = Suit[strain]
+            suits = [trumps, *sorted((suit for suit in Suit if suit != trumps),
+                                     key=codes.__getitem__)]
+        return ((self.spots.value if self.spots else None, strain == "N",
+                 *map(codes.__getitem__, suits)),
+                suits)
+
+    def _get(self, key):
+        try:
+            with self._lock:
+                value = self._data[key]
+                self._data.move_to_end(key)
+        except KeyError:
+            db = self._connection()
+            row = db and db.execute(
+                "SELECT value FROM results WHERE key = ?",
+                (repr(key),)).fetchone()
+            if not row:
+                self.misses += 1
+                return None
+            value = ast.literal_eval(row[0])
+            self._remember(key, value)
+        self.hits += 1
+        return value
+
+    def _set(self, key, value):
+        self._remember(key, value)
+        db = self._connection()
+        if db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?)",
+                       (repr(key), repr(value)))
+
+    def _remember(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_tricks(self, deal, strain, declarer):
+        """Return declarer's number of tricks, or None if not cached."""
+        key, _ = self._canonical(deal, strain, declarer)
+        return self._get(("tricks", *key))
+
+    def set_tricks(self, deal, strain, declarer, tricks):
+        """Cache declarer's number of tricks."""
+        key, _ = self._canonical(deal, strain, declarer)
+        self._set(("tricks", *key), tricks)
+
+    def get_leads(self, deal, strain, leader):
+        """
+        Return the ``lead -> tricks`` dict for *leader*, or None if not cached.
+        """
+        key, suits = self._canonical(deal, strain, leader)
+        leads = self._get(("leads", *key))
+        if leads is None:
+            return None
+        # Leads are stored as (suit position, index in the leader's holding).
+        holdings = [sorted(deal[Seat[leader]][suit], reverse=True)
+                    for suit in suits]
+        return {Card(suits[pos], holdings[pos][idx]): tricks
+                for pos, idx, tricks in leads}
+
+    def set_leads(self, deal, strain, leader, leads):
+        """Cache the ``lead -> tricks`` dict for *leader*."""
+        key, suits = self._canonical(deal, strain, leader)
+        hand = deal[Seat[leader]]
+        self._set(("leads", *key), tuple(
+            (suits.index(card.suit),
+             sorted(hand[card.suit], reverse=True).index(card.rank),
+             tricks)
+            for card, tricks in leads.items()))
+
+
+cache = DDCache()
@@ -1,25 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import ctypes
 from ctypes import POINTER, Structure, byref, c_char, c_int, c_uint
 import os
+import struct
 import sys
+import threading
 
 from .global_defs import Card, Rank, Seat, Strain, Suit
 
 
+_C_STRAINS = {
+    Strain.C: 3, Strain.D: 2, Strain.H: 1, Strain.S: 0, Strain.N: 4,
+}
+_SUITS = [Suit.S, Suit.H, Suit.D, Suit.C]
+
+
 def to_c_strain(strain):
-    return {
-        Strain.C: 3, Strain.D: 2, Strain.H: 1, Strain.S: 0, Strain.N: 4,
-    }[strain]
+    return _C_STRAINS[strain]
 
 
 def to_suit(suit):
-    return {3: Suit.C, 2: Suit.D, 1: Suit.H, 0: Suit.S}[suit]
+    return _SUITS[suit]
 
 
 def convert_rank(rank):
     return rank.value if isinstance(rank, Rank) else Rank(rank)
 
 
+MAXNOOFBOARDS = 200
+MAXNOOFTABLES = 40
+
+
+_Cards = c_uint * 4 * 4
+_cards_struct = struct.Struct("16I")  # Native unsigned ints, like c_uint.
+
+
+def _cards(deal):
+    """
+    Return the deal's cards in remainCards format.
+
+    The packed array is cached on the deal (as bytes, which, unlike ctypes
+    arrays, can be pickled), as deals are usually solved more than once (e.g.,
+    for several strains or declarers).
+    """
+    try:
+        packed = deal._dds_cards
+    except AttributeError:
+        # bit #i (2 <= i <= 14) is set if card of rank i (A = 14) is held,
+        # i.e. the holding mask shifted by 2.
+        packed = _cards_struct.pack(
+            *[mask << 2 for hand in deal for mask in hand.masks])
+        try:
+            deal._dds_cards = packed
+        except AttributeError:  # Not a redeal.Deal.
+            pass
+    return _Cards.from_buffer_copy(packed)
+
+
 class Deal(Structure):
     """The deal struct."""
 
@@ -29,22 +67,18 @@ class Deal(Structure):
         ("currentTrickSuit", c_int * 3),
         ("currentTrickRank", c_int * 3),  # 2-14, up to 3 cards; 0=unplayed
         # remainCards[hand][suit] is a bit-array (2->2^2, ..., A->2^14)
-        ("remainCards", c_uint * 4 * 4),
+        ("remainCards", _Cards),
     ]
 
     @classmethod
     def from_deal(cls, deal, strain, leader, current_trick=()):
-        self = cls(trump=to_c_strain(strain),
-                   first=leader.value,
-                   currentTrickSuit=(c_int * 3)(
-                       *[card.suit.value for card in current_trick]),
-                   currentTrickRank=(c_int * 3)(
-                       *[card.rank.value for card in current_trick]))
-        # bit #i (2 ≤ i ≤ 14) is set if card of rank i (A = 14) is held
-        for seat, hand in enumerate(deal):
-            for suit, holding in enumerate(hand):
-                self.remainCards[seat][suit] = sum(
-                    1 << convert_rank(rank) for rank in holding)
+        self = cls(_C_STRAINS[strain], leader.value)
+        if current_trick:
+            self.currentTrickSuit[:len(current_trick)] = [
+                card.suit.value for card in current_trick]
+            self.currentTrickRank[:len(current_trick)] = [
+                card.rank.value for card in current_trick]
+        self.remainCards = _cards(deal)
         return self
 
 
@@ -83,6 +117,115 @@ class FutureTricks(Structure):
                 ("score", c_int * 13)]
 
 
+class Boards(Structure):
+    """The boards struct."""
+
+    _fields_ = [("noOfBoards", c_int),
+                ("deals", Deal * MAXNOOFBOARDS),
+                ("target", c_int * MAXNOOFBOARDS),
+                ("solutions", c_int * MAXNOOFBOARDS),
+                ("mode", c_int * MAXNOOFBOARDS)]
+
+
+class SolvedBoards(Structure):
+    """The solvedBoards struct."""
+
+    _fields_ = [("noOfBoards", c_int),
+                ("solvedBoard", FutureTricks * MAXNOOFBOARDS)]
+
+
+class DDTableDeal(Structure):
+    """The ddTableDeal struct."""
+
+    _fields_ = [("cards", _Cards)]  # Same format as remainCards.
+
+    @classmethod
+    def from_deal(cls, deal):
+        return cls(_cards(deal))
+
+
+class DDTableDeals(Structure):
+    """The ddTableDeals struct."""
+
+    _fields_ = [("noOfTables", c_int),
+                ("deals", DDTableDeal * (MAXNOOFTABLES * len(Strain)))]
+
+
+class DDTableResults(Structure):
+    """The ddTableResults struct."""
+
+    _fields_ = [("resTable", c_int * 4 * 5)]  # resTable[strain][declarer]
+
+    @classmethod
+    def from_dict(cls, table):
+        """Initialize from a ``(strain, declarer) -> tricks`` dict."""
+        self = cls()
+        for (strain, seat), tricks in table.items():
+            self.resTable[to_c_strain(strain)][seat] = tricks
+        return self
+
+    def to_dict(self):
+        """Return a ``(strain, declarer) -> tricks`` dict."""
+        return {(strain, seat): self.resTable[to_c_strain(strain)][seat]
+                for strain in Strain for seat in Seat}
+
+
+class DDTablesRes(Structure):
+    """The ddTablesRes struct."""
+
+    _fields_ = [("noOfBoards", c_int),
+                ("results", DDTableResults * (MAXNOOFTABLES * len(Strain)))]
+
+
+class ParResults(Structure):
+    """The parResults struct."""
+
+    _fields_ = [("parScore", c_char * 16 * 2),
+                ("parContractsString", c_char * 128 * 2)]
+
+
+class AllParResults(Structure):
+    """The allParResults struct."""
+
+    _fields_ = [("presults", ParResults * MAXNOOFTABLES)]
+
+
+class ContractType(Structure):
+    """The contractType struct."""
+
+    _fields_ = [("underTricks", c_int),
+                ("overTricks", c_int),
+                ("level", c_int),
+                ("denom", c_int),  # 0=NT, 1=S, 2=H, 3=D, 4=C
+                ("seats", c_int)]  # 0=N, 1=E, 2=S, 3=W, 4=NS, 5=EW
+
+
+class ParResultsMaster(Structure):
+    """The parResultsMaster struct."""
+
+    _fields_ = [("score", c_int),
+                ("number", c_int),
+                ("contracts", ContractType * 10)]
+
+
+class DDSInfo(Structure):
+    """The DDSInfo struct."""
+
+    _fields_ = [("major", c_int),
+                ("minor", c_int),
+                ("patch", c_int),
+                ("versionString", c_char * 10),
+                ("system", c_int),
+                ("numBits", c_int),
+                ("compiler", c_int),
+                ("constructor", c_int),
+                ("numCores", c_int),
+                ("threading", c_int),
+                ("noOfThreads", c_int),
+                ("threadSizes", c_char * 128),
+                ("systemString", c_char * 1024)]
+
+
 SolveBoardStatus = {
     1: "No fault",
     -1: "Unknown fault",
@@ -102,16 +245,158 @@ SolveBoardStatus = {
 }
 
 
-def _solve_board(deal, strain, leader, target, sol, mode, current_trick):
-    c_deal = Deal.from_deal(deal, strain, leader, current_trick)
-    futp = FutureTricks()
-    status = dll.SolveBoard(c_deal, target, sol, mode, byref(futp), 0)
+def _check_status(name, deal, status):
     if status != 1:
-        raise Exception("SolveBoard({}, ...) failed with status {} ({}).".
-                        format(deal, status, SolveBoardStatus[status]))
+        try:
+            message = SolveBoardStatus[status]
+        except KeyError:
+            line = ctypes.create_string_buffer(80)
+            dll.ErrorMessage(status, line)
+            message = line.value.decode("ascii")
+        raise Exception(f"{name}({deal}, ...) failed with status {status} "
+                        f"({message}).")
+
+
+# DDS keeps per-thread data (e.g., transposition tables) in thread slots,
+# selected by SolveBoard's threadIndex argument.  Concurrent SolveBoard calls
+# must use distinct slots, and functions that use DDS's own thread pool need
+# all of them.
+class _ThreadSlots:
+    """
+    The pool of DDS thread slots.
+
+    Each Python thread is preferably given the same slot for all its calls, so
+    that DDS can reuse the data it left in the slot.
+    """
+
+    def __init__(self, n):
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._exclusive = 0  # Number of threads waiting for all slots.
+        self.resize(n)
+
+    def resize(self, n):
+        # Only call when holding all slots, or before any slot is used.
+        self.n = n
+        self._free = set(range(n))
+
+    @contextlib.contextmanager
+    def one(self):
+        """Reserve a slot for a SolveBoard call."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._free and not self._exclusive)
+            slot = getattr(self._local, "slot", None)
+            if slot not in self._free:
+                slot = self._local.slot = min(self._free)
+            self._free.remove(slot)
+        try:
+            yield slot
+        finally:
+            with self._cond:
+                self._free.add(slot)
+                self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def all(self):
+        """Reserve all slots, for functions using DDS's thread pool."""
+        with self._cond:
+            self._exclusive += 1
+            self._cond.wait_for(lambda: len(self._free) == self.n)
+            self._exclusive -= 1
+            self._free.clear()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free = set(range(self.n))
+                self._cond.notify_all()
+
+
+_thread_slots = _ThreadSlots(1)
+_executor = None
+
+
+def executor():
+    """
+    Return the thread pool used to solve deals in the background.
+
+    The pool has one worker per DDS thread slot.  DDS releases the GIL while
+    solving, so that the calling thread can keep on dealing meanwhile.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(_thread_slots.n, "dds")
+    return _executor
+
+
+def max_threads():
+    """Return the number of DDS thread slots."""
+    return _thread_slots.n
+
+
+def set_max_threads(n):
+    """
+    Set the number of DDS thread slots; wraps SetMaxThreads.
+
+    0 lets DDS choose based on the number of cores and available memory; DDS
+    may also use fewer threads than requested.  The slots determine how many
+    deals can be solved concurrently, both by Python threads and by DDS's own
+    thread pool.
+    """
+    global _executor
+    _check_dll("set_max_threads")
+    with _thread_slots.all():
+        dll.SetMaxThreads(n)
+        info = DDSInfo()
+        dll.GetDDSInfo(byref(info))
+        _thread_slots.resize(max(info.noOfThreads, 1))
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+# Per-thread FutureTricks buffers, reused across SolveBoard calls.  The results
+# must be read before the thread's next call.
+_buffers = threading.local()
+
+
+def _future_tricks():
+    try:
+        return _buffers.futp
+    except AttributeError:
+        futp = _buffers.futp = FutureTricks()
+        return futp
+
+
+def _solve_board(deal, strain, leader, target, sol, mode, current_trick,
+                 slot=None):
+    c_deal = Deal.from_deal(deal, strain, leader, current_trick)
+    futp = _future_tricks()
+    if slot is None:
+        with _thread_slots.one() as slot:
+            status = dll.SolveBoard(
+                c_deal, target, sol, mode, byref(futp), slot)
+    else:
+        status = dll.SolveBoard(c_deal, target, sol, mode, byref(futp), slot)
+    _check_status("SolveBoard", deal, status)
     return futp
 
 
+def _makes_target(tricks):
+    """
+    Return the SolveBoard target for checking whether declarer can take
+    *tricks*, or the answer if it is trivial.
+
+    The target applies to the leader's side: declarer takes *tricks* unless
+    the defense takes ``14 - tricks``.
+    """
+    if tricks <= 0:
+        return True
+    if tricks > len(Rank):
+        return False
+    return len(Rank) + 1 - tricks
+
+
 def solve(deal, strain, declarer, current_trick=()):
     """Return the number of tricks for declarer; wraps SolveBoard."""
     _check_dll("solve")
@@ -122,20 +407,140 @@ def solve(deal, strain, declarer, current_trick=()):
     return best_score
 
 
+def makes(deal, strain, declarer, tricks):
+    """
+    Return whether declarer can take at least *tricks* tricks; wraps
+    SolveBoard.
+
+    This is cheaper than computing the exact number of tricks, as DDS can stop
+    searching as soon as the answer is known.
+    """
+    _check_dll("makes")
+    target = _makes_target(tricks)
+    if isinstance(target, bool):
+        return target
+    futp = _solve_board(
+        deal, Strain[strain], Seat[declarer] + 1, target, 1, 1, ())
+    return futp.score[0] < target
+
+
 def solve_pbn(deal, strain, declarer, current_trick=()):
     """Return the number of tricks for declarer; wraps SolveBoardPBN."""
     _check_dll("solve_pbn")
     leader = Seat[declarer] + 1
     c_deal_pbn = DealPBN.from_deal(deal, Strain[strain], leader, current_trick)
-    futp = FutureTricks()
-    status = dll.SolveBoardPBN(c_deal_pbn, -1, 1, 1, byref(futp), 0)
-    if status != 1:
-        raise Exception("SolveBoardPBN({}, ...) failed with status {} ({}).".
-                        format(deal, status, SolveBoardStatus[status]))
+    futp = _future_tricks()
+    with _thread_slots.one() as slot:
+        status = dll.SolveBoardPBN(c_deal_pbn, -1, 1, 1, byref(futp), slot)
+    _check_status("SolveBoardPBN", deal, status)
     best_score = len(Rank) - futp.score[0]
     return best_score
 
 
+def solve_many(deals, strains, declarers):
+    """
+    Return the number of tricks for declarer for each deal; wraps
+    SolveAllBoardsBin.
+
+    *deals*, *strains* and *declarers* are iterated over in parallel.  The
+    boards are sent to DDS in chunks of `MAXNOOFBOARDS`, which DDS solves
+    using its own thread pool.
+    """
+    _check_dll("solve_many")
+    boards = [*zip(deals, strains, declarers)]
+    tricks = []
+    for start in range(0, len(boards), MAXNOOFBOARDS):
+        chunk = boards[start:start + MAXNOOFBOARDS]
+        bop = Boards(noOfBoards=len(chunk))
+        for i, (deal, strain, declarer) in enumerate(chunk):
+            bop.deals[i] = Deal.from_deal(
+                deal, Strain[strain], Seat[declarer] + 1)
+            # find one optimal card with its score, even if only one card
+            bop.target[i] = -1
+            bop.solutions[i] = 1
+            bop.mode[i] = 1
+        solvedp = SolvedBoards()
+        with _thread_slots.all():
+            status = dll.SolveAllBoardsBin(byref(bop), byref(solvedp))
+        _check_status("SolveAllBoardsBin", chunk[0][0], status)
+        tricks.extend(len(Rank) - solvedp.solvedBoard[i].score[0]
+                      for i in range(len(chunk)))
+    return tricks
+
+
+def calc_dd_table(deal):
+    """
+    Return the double-dummy table of a deal; wraps CalcDDtable.
+
+    The table is a ``(strain, declarer) -> tricks`` dict.
+    """
+    _check_dll("calc_dd_table")
+    tablep = DDTableResults()
+    with _thread_slots.all():
+        status = dll.CalcDDtable(DDTableDeal.from_deal(deal), byref(tablep))
+    _check_status("CalcDDtable", deal, status)
+    return tablep.to_dict()
+
+
+def calc_all_tables(deals):
+    """
+    Return the double-dummy table of each deal; wraps CalcAllTables.
+
+    Each table is a ``(strain, declarer) -> tricks`` dict.  The deals are sent
+    to DDS in chunks of `MAXNOOFTABLES`, which DDS solves using its own thread
+    pool.
+    """
+    _check_dll("calc_all_tables")
+    deals = [*deals]
+    tables = []
+    for start in range(0, len(deals), MAXNOOFTABLES):
+        chunk = deals[start:start + MAXNOOFTABLES]
+        dealsp = DDTableDeals(noOfTables=len(chunk))
+        for i, deal in enumerate(chunk):
+            dealsp.deals[i] = DDTableDeal.from_deal(deal)
+        trump_filter = (c_int * len(Strain))()  # Solve all strains.
+        resp = DDTablesRes()
+        presp = AllParResults()
+        # mode=-1: don't compute par scores.
+        with _thread_slots.all():
+            status = dll.CalcAllTables(
+                byref(dealsp), -1, trump_filter, byref(resp), byref(presp))
+        _check_status("CalcAllTables", chunk[0], status)
+        tables.extend(resp.results[i].to_dict() for i in range(len(chunk)))
+    return tables
+
+
+def dealer_par(table, dealer, nsvul, ewvul):
+    """
+    Return the par contracts for a double-dummy table; wraps DealerParBin.
+
+    *table* is a ``(strain, declarer) -> tricks`` dict.  Returns a list of
+    ``(level, strain, doubled, declarers, tricks)`` tuples, where *declarers*
+    lists the seats from which the contract can be played.  The list is empty
+    if the par is to pass the deal out.
+    """
+    _check_dll("dealer_par")
+    tablep = DDTableResults.from_dict(table)
+    presp = ParResultsMaster()
+    # 0=None, 1=Both, 2=NS, 3=EW.
+    vulnerable = {(False, False): 0, (True, True): 1,
+                  (True, False): 2, (False, True): 3}[bool(nsvul), bool(ewvul)]
+    status = dll.DealerParBin(
+        byref(tablep), byref(presp), Seat[dealer].value, vulnerable)
+    _check_status("DealerParBin", table, status)
+    pars = []
+    for contract in presp.contracts[:presp.number if presp.score else 0]:
+        strain = [Strain.N, Strain.S, Strain.H, Strain.D, Strain.C][
+            contract.denom]
+        declarers = ([Seat(contract.seats)] if contract.seats < len(Seat)
+                     else [Seat(contract.seats - 4), Seat(contract.seats - 2)])
+        tricks = (contract.level + 6
+                  + contract.overTricks - contract.underTricks)
+        pars.append((contract.level, strain, contract.underTricks > 0,
+                     declarers, tricks))
+    return pars
+
+
 def valid_cards(deal, strain, leader, current_trick=()):
     """Return all cards that can be played."""
     _check_dll("valid_cards")
@@ -156,6 +561,69 @@ def solve_all(deal, strain, leader, current_trick=()):
             futp.score[i] for i in range(futp.cards)}
 
 
+class Session:
+    """
+    A context manager that keeps a deal loaded in a DDS thread slot.
+
+    Within the session, consecutive queries in the same strain reuse DDS's
+    transposition table (SolveBoard's ``mode=2``), which makes solving the
+    same deal for other declarers or other targets cheaper::
+
+        with dds.Session(deal) as session:
+            tricks = {declarer: session.solve("S", declarer)
+                      for declarer in "NESW"}
+
+    The thread slot is reserved for the whole session, so other DDS calls
+    from the same thread must not be made while it is open (they would wait
+    for a free slot, forever if there is only one).
+    """
+
+    def __init__(self, deal):
+        _check_dll("Session")
+        self.deal = deal
+        self._slots = None
+        self._slot = None
+        self._strain = None
+
+    def __enter__(self):
+        self._slots = _thread_slots.one()
+        self._slot = self._slots.__enter__()
+        self._strain = None
+        return self
+
+    def __exit__(self, *exc_info):
+        slots, self._slots, self._slot = self._slots, None, None
+        return slots.__exit__(*exc_info)
+
+    def _solve(self, strain, leader, target, sol):
+        if self._slot is None:
+            raise Exception("Session used outside of a with statement")
+        strain = Strain[strain]
+        mode = 2 if strain == self._strain else 1
+        self._strain = strain
+        return _solve_board(
+            self.deal, strain, leader, target, sol, mode, (), self._slot)
+
+    def solve(self, strain, declarer):
+        """Return the number of tricks for declarer, like `solve`."""
+        futp = self._solve(strain, Seat[declarer] + 1, -1, 1)
+        return len(Rank) - futp.score[0]
+
+    def makes(self, strain, declarer, tricks):
+        """Return whether declarer can take *tricks* tricks, like `makes`."""
+        target = _makes_target(tricks)
+        if isinstance(target, bool):
+            return target
+        futp = self._solve(strain, Seat[declarer] + 1, target, 1)
+        return futp.score[0] < target
+
+    def solve_all(self, strain, leader):
+        """Return the number of tricks for each lead, like `solve_all`."""
+        futp = self._solve(strain, Seat[leader], -1, 3)
+        return {Card(to_suit(futp.suit[i]), convert_rank(futp.rank[i])):
+                futp.score[i] for i in range(futp.cards)}
+
+
 dll_name = DLL = None
 if os.name == "posix":
     dll_name = "libdds.so"
@@ -174,8 +642,17 @@ if dll_name and os.path.exists(dll_path):
         Deal, c_int, c_int, c_int, POINTER(FutureTricks), c_int]
     dll.SolveBoardPBN.argtypes = [
         DealPBN, c_int, c_int, c_int, POINTER(FutureTricks), c_int]
-    if os.name == "posix":
-        dll.SetMaxThreads(0)
+    dll.SolveAllBoardsBin.argtypes = [
+        POINTER(Boards), POINTER(SolvedBoards)]
+    dll.CalcDDtable.argtypes = [DDTableDeal, POINTER(DDTableResults)]
+    dll.CalcAllTables.argtypes = [
+        POINTER(DDTableDeals), c_int, c_int * len(Strain),
+        POINTER(DDTablesRes), POINTER(AllParResults)]
+    dll.DealerParBin.argtypes = [
+        POINTER(DDTableResults), POINTER(ParResultsMaster), c_int, c_int]
+    dll.ErrorMessage.argtypes = [c_int, POINTER(c_char)]
+    dll.GetDDSInfo.argtypes = [POINTER(DDSInfo)]
+    dll.SetMaxThreads.argtypes = [c_int]
 
     def _check_dll(name):
         return
@@ -183,3 +660,7 @@ if dll_name and os.path.exists(dll_path):
 else:
     def _check_dll(name):
         raise Exception(f"Unable to load DDS; {name} is not available")
+
+
+if dll_name and os.path.exists(dll_path):
+    set_max_threads(int(os.environ.get("REDEAL_DDS_THREADS", 0)))
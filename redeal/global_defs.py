@@ -30,6 +30,8 @@ class Suit(Enum):
         return self._unicode_sym if SUITS_FORCE_UNICODE else self._sym
 
     def __index__(self): return self.value
+    # Pickle by name, as the value passed to the constructor is a tuple.
+    def __reduce_ex__(self, proto): return getattr, (type(self), self.name)
     # Yes, the order is reversed.
     def __lt__(self, other): return self.value > other.value
     def __le__(self, other): return self.value >= other.value
@@ -63,3 +65,5 @@ Card.__str__ = lambda self: "{0.suit}{0.rank}".format(self)
 Card.__format__ = lambda self, fmt: format(str(self), fmt)
 FULL_DECK = {Card(suit=suit, rank=rank)
              for suit, rank in itertools.product(Suit, Rank)}
+# The 52-bit mask of all the cards (see `Hand.bits`).
+_ALL_CARDS = (1 << 52) - 1
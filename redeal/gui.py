@@ -123,6 +123,8 @@ class Application(tk.Frame):
                                     if self.seats[seat].get_value()])
         _verbose = self.main.args.verbose
         self.main.args.verbose = False  # FIXME backspace support in tk text.
+        _jobs = self.main.args.jobs
+        self.main.args.jobs = 1  # Workers would not see the GUI's settings.
         # override configurables #1
         _n = self.main.args.n
         self.main.args.n = int(self.n.get())
@@ -151,6 +153,7 @@ class Application(tk.Frame):
                 self.stop_button.config(state=tk.DISABLED)
             # reset settings
             self.main.args.verbose = _verbose
+            self.main.args.jobs = _jobs
             self.main.args.n = _n
             self.main.args.max = _max
             self.main.predeal = _predeal
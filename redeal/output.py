@@ -0,0 +1,140 @@
+"""
+Writing accepted deals to files, in PBN, JSON Lines or binary format.
+
+Deals are buffered in chunks, which are formatted and written by a background
+thread (and whose double-dummy tables, if requested, are solved there by
+`Deal.dd_tables`), so that the main thread can keep on dealing.
+"""
+
+import json
+import os
+import queue
+import threading
+
+from . import binary, pbn
+from .global_defs import Seat
+from .redeal import Deal
+
+
+class DealWriter:
+    """
+    A writer of deals to a file, formatted according to the file's extension
+    (``.pbn``, ``.jsonl`` or ``.bin``).
+
+    Use as a context manager, or call `close` when done.
+    """
+
+    def __init__(self, path, dd=False, first_board=1, chunk_size=1000):
+        """
+        Boards are numbered starting from *first_board*; if *dd* is set, the
+        double-dummy table of each deal is also written.
+        """
+        self.format = os.path.splitext(path)[1][1:].lower()
+        if self.format not in ["pbn", "jsonl", "bin"]:
+            raise Exception(
+                f"Unsupported output format: {path} (the extension must be "
+                f".pbn, .jsonl or .bin)")
+        self.path = path
+        self.dd = dd
+        self.board = first_board
+        self.chunk_size = chunk_size
+        self._chunk = []
+        self._chunks = queue.Queue(maxsize=8)
+        self._error = None
+        self._file = open(path, "wb")
+        if self.format == "bin":
+            self._file.write(binary.pack_header(dd))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, deal):
+        """Queue a deal for writing."""
+        self._chunk.append(deal)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush_chunk()
+
+    def close(self):
+        """Write the remaining deals and close the file."""
+        if self._file.closed:
+            return
+        self._flush_chunk()
+        self._chunks.put(None)
+        self._thread.join()
+        self._file.close()
+        self._check_error()
+
+    def _flush_chunk(self):
+        self._check_error()
+        if self._chunk:
+            self._chunks.put((self.board, self._chunk))
+            self.board += len(self._chunk)
+            self._chunk = []
+
+    def _check_error(self):
+        if self._error is not None:
+            raise Exception(
+                f"Failed to write deals to {self.path}") from self._error
+
+    def _run(self):
+        format_deal = getattr(self, f"_format_{self.format}")
+        while True:
+            item = self._chunks.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue  # Drain the queue, so that writers do not block.
+            first_board, deals = item
+            try:
+                tables = (Deal.dd_tables(deals) if self.dd
+                          else [None] * len(deals))
+                self._file.write(b"".join(
+                    format_deal(deal, board, table)
+                    for board, (deal, table)
+                    in enumerate(zip(deals, tables), first_board)))
+            except Exception as exc:
+                self._error = exc
+
+    def _format_pbn(self, deal, board, table):
+        return pbn.format_board(deal, board, table).encode("ascii")
+
+    def _format_jsonl(self, deal, board, table):
+        record = {"board": board,
+                  "dealer": pbn.dealer(board).name,
+                  "vulnerable": pbn.vulnerable(board),
+                  "deal": pbn.format_deal(deal)}
+        if table is not None:
+            # Declarer's tricks, by declarer and then by strain.
+            record["dd"] = {
+                seat.name: {strain.name: tricks
+                            for (strain, declarer), tricks in table.items()
+                            if declarer == seat}
+                for seat in Seat}
+        return (json.dumps(record) + "\n").encode("ascii")
+
+    def _format_bin(self, deal, board, table):
+        return binary.pack_deal(deal, table)
+
+
+def concatenate(path, parts):
+    """
+    Concatenate the files written by several `DealWriter`\\s (e.g., by
+    parallel jobs) to *path*, and delete them.
+    """
+    skip = binary.HEADER_SIZE if path.lower().endswith(".bin") else 0
+    with open(path, "wb") as file:
+        for idx, part in enumerate(parts):
+            with open(part, "rb") as part_file:
+                if idx:
+                    part_file.seek(skip)
+                while True:
+                    data = part_file.read(1 << 20)
+                    if not data:
+                        break
+                    file.write(data)
+            os.remove(part)
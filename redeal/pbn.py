@@ -0,0 +1,332 @@
+"""
+Reading and writing deals in PBN format.
+
+Boards are numbered from 1; as at the table, the board number determines the
+dealer and the vulnerability (see `dealer` and `vulnerable`).
+
+Deals are parsed directly into 52-bit hand masks (see `Hand.bits`), looking
+up whole holdings at once, which is much faster than going through
+`Hand.from_str`.  Whole files are handled by `read` (and `read_arrays`, which
+returns NumPy arrays) and `write`.
+"""
+
+from collections import namedtuple
+import re
+
+from .global_defs import _ALL_CARDS, Rank, Seat, Strain, Suit
+from .redeal import Deal, Holding
+
+
+VULNERABLE = ["None", "NS", "EW", "All"]
+_VULNERABLE = {"None": 0, "Love": 0, "-": 0, "NS": 1, "EW": 2,
+               "All": 3, "Both": 3}
+# PBN names of the strains, in OptimumResultTable order.
+_STRAINS = [(Strain.N, "NT"), (Strain.S, "S"), (Strain.H, "H"),
+            (Strain.D, "D"), (Strain.C, "C")]
+# The PBN string of each holding, indexed by mask (voids are empty).
+_HOLDINGS = ["".join(rank.name for rank in reversed(Rank)
+                     if mask >> (rank.value - 2) & 1)
+             for mask in range(len(Holding._by_mask))]
+_MASKS = {holding: mask for mask, holding in enumerate(_HOLDINGS)}
+_RANKS = "23456789TJQKA"
+_DEAL_TAG = re.compile(r'^\[Deal "([^"]*)"\]', re.MULTILINE)
+# The tags of interest, each followed by its data section (the lines up to
+# the next tag or empty line), which is only used for OptimumResultTable.
+_BOARD_TAG = re.compile(
+    r'^\[(Board|Dealer|Vulnerable|Deal|OptimumResultTable) "([^"]*)"\][^\n]*'
+    r'\n?((?:[^\[\s][^\n]*\n?)*)', re.MULTILINE)
+_TABLE_STRAINS = {"NT": Strain.N, "N": Strain.N, "S": Strain.S,
+                  "H": Strain.H, "D": Strain.D, "C": Strain.C}
+
+
+Board = namedtuple("Board", ["board", "dealer", "vulnerable", "deal", "table"])
+Board.__doc__ = """
+A board: its number (an int), dealer (a `Seat`), vulnerability (one of
+`VULNERABLE`), `Deal`, and double-dummy table (a ``(strain, declarer) ->
+tricks`` dict); missing fields are None.
+"""
+
+
+def dealer(board):
+    """Return the dealer of a board."""
+    return Seat((board - 1) % len(Seat))
+
+
+def vulnerable(board):
+    """Return the vulnerability of a board, as a PBN string, e.g. "NS"."""
+    k = (board - 1) % 16
+    return VULNERABLE[(k // 4 + k % 4) % 4]
+
+
+def format_deal(deal):
+    """Return the value of a deal's Deal tag, e.g. "N:AK... ..."."""
+    return "N:" + " ".join(
+        ".".join([_HOLDINGS[holding.mask] for holding in hand])
+        for hand in deal)
+
+
+def _format_bits(all_bits):
+    """Like `format_deal`, but from the four hands' 52-bit masks."""
+    return "N:" + " ".join(
+        f"{_HOLDINGS[bits & 0x1fff]}.{_HOLDINGS[bits >> 13 & 0x1fff]}."
+        f"{_HOLDINGS[bits >> 26 & 0x1fff]}.{_HOLDINGS[bits >> 39]}"
+        for bits in all_bits)
+
+
+def format_board(deal, board, table=None, dealer_=None, vulnerable_=None):
+    """
+    Return a board in PBN format, with Board, Dealer, Vulnerable and Deal tags.
+
+    The dealer and vulnerability are those of the board number, unless given
+    as *dealer_* (a `Seat`) and *vulnerable_* (one of `VULNERABLE`).  If
+    *table* (a ``(strain, declarer) -> tricks`` dict, as returned by
+    `Deal.dd_table`) is given, an OptimumResultTable tag is added.
+    """
+    lines = [f'[Board "{board}"]',
+             f'[Dealer "{(dealer_ or dealer(board)).name}"]',
+             f'[Vulnerable "{vulnerable_ or vulnerable(board)}"]',
+             f'[Deal "{format_deal(deal)}"]']
+    if table is not None:
+        lines.append(
+            '[OptimumResultTable "Declarer;Denomination\\2R;Result\\2R"]')
+        lines.extend(f"{seat.name} {name} {table[strain, seat]}"
+                     for seat in [Seat.N, Seat.S, Seat.E, Seat.W]
+                     for strain, name in _STRAINS)
+    lines.append("\n")
+    return "\n".join(lines)
+
+
+# For each suit, the holdings' masks, shifted to their place in `Hand.bits`.
+_SPADES, _HEARTS, _DIAMONDS, _CLUBS = (
+    {holding: mask << 13 * suit for holding, mask in _MASKS.items()}
+    for suit in range(len(Suit)))
+_FIRST = {seat.name: seat.value for seat in Seat}
+# For each first seat of a Deal tag, the seats of its hands.
+_ORDERS = {seat.name: [(seat.value + k) % len(Seat) for k in range(len(Seat))]
+           for seat in Seat}
+
+
+def _holding_mask(holding):
+    try:
+        return _MASKS[holding]
+    except KeyError:  # Lowercase or unsorted ranks.
+        mask = 0
+        for rank in holding.upper():
+            bit = 1 << _RANKS.index(rank)
+            if mask & bit:
+                raise ValueError
+            mask |= bit
+        return mask
+
+
+def parse_deal(deal):
+    """
+    Parse the value of a Deal tag, e.g. "N:AK... ...", into a list of the
+    four hands' 52-bit masks (north first).
+    """
+    try:
+        try:  # Fast path, for sorted, uppercase ranks.
+            first, hands = deal.split(":")
+            order = _ORDERS[first]
+            hands = hands.split()
+            if len(hands) != len(order):
+                raise ValueError
+            all_bits = [0, 0, 0, 0]
+            for seat, hand in zip(order, hands):
+                spades, hearts, diamonds, clubs = hand.split(".")
+                all_bits[seat] = (_SPADES[spades] | _HEARTS[hearts]
+                                  | _DIAMONDS[diamonds] | _CLUBS[clubs])
+        except KeyError:
+            first, hands = deal.split(":")
+            first = Seat[first.strip().upper()].value
+            all_bits = [0] * len(Seat)
+            for k, hand in enumerate(hands.split()):
+                holdings = hand.split(".")
+                if len(holdings) != len(Suit):
+                    raise ValueError
+                all_bits[(first + k) % len(Seat)] = sum(
+                    _holding_mask(holding) << 13 * suit
+                    for suit, holding in enumerate(holdings))
+        if not (sum(all_bits) == _ALL_CARDS
+                and all_bits[0] | all_bits[1] | all_bits[2] | all_bits[3]
+                == _ALL_CARDS):
+            raise ValueError
+    except (KeyError, ValueError):
+        raise Exception(f"Invalid or incomplete PBN deal: {deal}") from None
+    return all_bits
+
+
+def parse_deals(text):
+    """Parse all the Deal tags in *text*, using `parse_deal`."""
+    return [*map(parse_deal, _DEAL_TAG.findall(text))]
+
+
+def _parse_table(header, rows):
+    """
+    Parse an OptimumResultTable into a list of tricks, as `_parse_boards`.
+    """
+    columns = [column.split("\\")[0] for column in header.split(";")]
+    try:
+        declarer_col = columns.index("Declarer")
+        strain_col = columns.index("Denomination")
+        tricks_col = columns.index("Result")
+        table = [None] * (len(Strain) * len(Seat))
+        for row in rows.splitlines():
+            fields = row.split()
+            if not fields:
+                continue
+            strain = _TABLE_STRAINS[fields[strain_col]]
+            seat = Seat[fields[declarer_col]]
+            table[len(Seat) * strain.value + seat.value] = int(
+                fields[tricks_col])
+        if None in table:
+            raise ValueError
+    except (IndexError, KeyError, ValueError):
+        raise Exception(f"Invalid OptimumResultTable: {rows}") from None
+    return table
+
+
+def _parse_boards(text):
+    """
+    Parse the boards in *text* into a list of ``(board, dealer, vulnerable,
+    bits, table)`` tuples of plain ints (or None, if missing), where *dealer*
+    is a seat index, *vulnerable* an index into `VULNERABLE`, *bits* the list
+    of the four hands' masks, and *table* the list of declarer's tricks for
+    each strain (clubs first) and declarer (north first).
+
+    Each board must have a Deal tag; a board ends when one of its tags
+    repeats.
+    """
+    boards = []
+    current = {}
+    for tag, value, data in _BOARD_TAG.findall(text):
+        if tag in current:
+            if "Deal" in current:
+                boards.append(_make_board(current))
+            current = {}
+        current[tag] = value, data
+    if "Deal" in current:
+        boards.append(_make_board(current))
+    return boards
+
+
+def _make_board(tags):
+    board = dealer = vulnerable = table = None
+    try:
+        if "Board" in tags:
+            board = int(tags["Board"][0])
+        if "Dealer" in tags:
+            dealer = _FIRST[tags["Dealer"][0]]
+        if "Vulnerable" in tags:
+            vulnerable = _VULNERABLE[tags["Vulnerable"][0]]
+    except (KeyError, ValueError):
+        raise Exception(f"Invalid PBN tags: {tags}") from None
+    if "OptimumResultTable" in tags:
+        table = _parse_table(*tags["OptimumResultTable"])
+    return board, dealer, vulnerable, parse_deal(tags["Deal"][0]), table
+
+
+def _chunks(file, size=1 << 22, by_line=False):
+    """
+    Read a text file in chunks of about *size*, ending at empty lines (or at
+    line boundaries, if *by_line* is set).
+    """
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        lines = [chunk]
+        if not chunk.endswith("\n"):
+            # Finish the partial line first, so that it cannot be mistaken for
+            # an empty one.
+            lines.append(file.readline())
+        if not by_line:
+            while True:
+                line = file.readline()
+                lines.append(line)
+                if not line.strip():
+                    break
+        yield "".join(lines)
+
+
+def _to_board(parsed):
+    """
+    Convert a board as returned by `_parse_boards` to a `Board`; the
+    double-dummy table, if any, is also stored in the deal's cache.
+    """
+    board, dealer, vulnerable, bits, table = parsed
+    deal = Deal.from_bits(bits)
+    if table is not None:
+        tricks = iter(table)
+        table = {(strain, seat): next(tricks)
+                 for strain in Strain for seat in Seat}
+        deal._dd_cache.update(
+            ((strain.name, seat.name), tricks)
+            for (strain, seat), tricks in table.items())
+    return Board(board,
+                 None if dealer is None else Seat(dealer),
+                 None if vulnerable is None else VULNERABLE[vulnerable],
+                 deal, table)
+
+
+def read(path):
+    """Iterate over the `Board`\\s of a PBN file."""
+    with open(path) as file:
+        for chunk in _chunks(file):
+            yield from map(_to_board, _parse_boards(chunk))
+
+
+BoardArrays = namedtuple(
+    "BoardArrays", ["board", "dealer", "vulnerable", "masks", "tables"])
+BoardArrays.__doc__ = """
+The boards of a PBN file, as NumPy arrays: board numbers, dealers (seat
+indices) and vulnerabilities (indices into `VULNERABLE`), ``(n,)`` arrays where
+missing values are -1; deals, a ``(n, 4, 4)`` array of suit masks as returned
+by `Dealer.batch`; and double-dummy tables, a ``(n, 5, 4)`` array of
+declarer's tricks indexed by board, strain (clubs first) and declarer, where
+missing tables are -1.
+"""
+
+
+def read_arrays(path):
+    """Read the boards of a PBN file as `BoardArrays`; requires NumPy."""
+    import numpy as np
+    boards = []
+    with open(path) as file:
+        for chunk in _chunks(file):
+            boards.extend(_parse_boards(chunk))
+    missing = [-1] * (len(Strain) * len(Seat))
+    board, dealer, vulnerable = (
+        np.array([-1 if row[k] is None else row[k] for row in boards],
+                 np.int64)
+        for k in range(3))
+    bits = np.array([row[3] for row in boards],
+                    np.uint64).reshape(-1, len(Seat))
+    masks = (bits[:, :, None] >> np.arange(0, 52, 13, dtype=np.uint64)
+             & np.uint64(0x1fff)).astype(np.uint16)
+    tables = np.array([missing if table is None else table
+                       for *_, table in boards],
+                      np.int8).reshape(-1, len(Strain), len(Seat))
+    return BoardArrays(board, dealer, vulnerable, masks, tables)
+
+
+def write(path, boards):
+    """
+    Write boards to a PBN file.
+
+    *boards* is an iterable of `Board`\\s, or of deals (which are numbered
+    from 1).  Board numbers and dealers and vulnerabilities that are None are
+    derived from the position in the file and from the board number.
+    """
+    with open(path, "w") as file:
+        lines = []
+        for idx, item in enumerate(boards, 1):
+            if not isinstance(item, Board):
+                item = Board(None, None, None, item, None)
+            lines.append(format_board(
+                item.deal, item.board or idx, item.table,
+                item.dealer, item.vulnerable))
+            if len(lines) >= 1000:
+                file.write("".join(lines))
+                lines = []
+        file.write("".join(lines))
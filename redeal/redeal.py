@@ -1,11 +1,11 @@
 from array import array
 from bisect import bisect
 from collections import Counter
-from itertools import combinations_with_replacement, permutations
-from operator import itemgetter, attrgetter
+from itertools import (
+    combinations, combinations_with_replacement, permutations)
+from operator import itemgetter
 import functools
 import random
-import statistics
 
 try:
     import colorama
@@ -17,15 +17,15 @@ try:
 except ImportError:
     BRIGHT_GREEN = BRIGHT_RED = RESET_ALL = ""
 
-from . import dds, util
+from . import dds, ddcache, util
 from .global_defs import Card, Rank, Seat, Strain, Suit, FULL_DECK
-from .smartstack import SmartStack
+from .smartstack import JointStack, SmartStack
 
 
 __all__ = ["Shape", "balanced", "semibalanced",
            "Evaluator", "hcp", "qp", "controls",
            "Rank", "A", "K", "Q", "J", "T", "Seat", "Strain", "Suit",
-           "Card", "Holding", "Hand", "H", "Deal", "SmartStack",
+           "Card", "Holding", "Hand", "H", "Deal", "LazyDeal", "SmartStack",
            "Contract", "C", "matchpoints", "imps", "Payoff",
            "Simulation", "OpeningLeadSim"]
 
@@ -145,8 +145,13 @@ class Shape:
         return self._table[self._shape_to_index[int_shape]]
 
     def __call__(self, hand):
-        """Check if the shape of the given hand is included."""
-        return hand.shape in self
+        """
+        Check if the shape of the given hand is included.
+
+        For a column of hands (see `redeal.batch`), return a boolean array.
+        """
+        shape = hand.shape
+        return shape in self if type(shape) is tuple else shape.isin(self)
 
     def __add__(self, other):
         """Return the union of two ``Shapes``."""
@@ -192,12 +197,33 @@ class Evaluator:
         self._vals = (0,) * (len(Rank) - len(vals)) + vals[::-1]
         self._le = kwargs.pop("le", None)
         self._ge = kwargs.pop("ge", None)
+        # table[mask] is the value of the holding with the given mask (see
+        # `Holding`); holdings whose highest card is of rank index i extend
+        # the holdings of the lower ranks.
+        self.table = [0]
+        for val in self._vals:
+            self.table += [value + val for value in self.table]
+
+    @classmethod
+    def from_func(cls, func):
+        """
+        Initialize from a holding evaluation function, which need not be
+        additive, by tabulating it over all holdings.
+        """
+        self = cls()
+        self.table = [func(holding) for holding in Holding._by_mask]
+        return self
 
     def __call__(self, arg):
-        if isinstance(arg, frozenset):  # Holding
-            return sum(self._vals[rank] for rank in arg)
+        if isinstance(arg, Holding):
+            return self.table[arg.mask]
+        elif isinstance(arg, frozenset):  # Set of ranks.
+            return self.table[sum(1 << (rank.value - 2) for rank in arg)]
         elif isinstance(arg, tuple):  # Hand
-            return sum(self(holding) for holding in arg)
+            table = self.table
+            return sum([table[holding.mask] for holding in arg])
+        elif hasattr(arg, "evaluate"):  # Column of hands or holdings.
+            return arg.evaluate(self)
         else:
             raise TypeError(f"Cannot evaluate {arg}")
 
@@ -219,11 +245,12 @@ class Deal(tuple):
         Contruct a dealer from a ``Seat -> [Hand | SmartStack]`` dict.
         Seat and/or Hand may be given as strings.
 
-        There can be at most one ``SmartStack`` entry.
+        Several seats may be smartstacked; their hands are then dealt jointly
+        (see `JointStack`).
         """
         predeal = {} if predeal is None else predeal.copy()
         dealer = {}
-        seat_smartstack = None
+        smartstacks = {}
         for seat in Seat:
             try:
                 pre = predeal.pop(str(seat)[0])
@@ -232,9 +259,7 @@ class Deal(tuple):
             if isinstance(pre, str):
                 dealer[seat] = H(pre).cards
             elif isinstance(pre, SmartStack):
-                if seat_smartstack:
-                    raise Exception("Only one Smartstack allowed.")
-                seat_smartstack = seat, pre
+                smartstacks[seat] = pre
             else:
                 dealer[seat] = pre.cards
         if predeal:
@@ -243,46 +268,93 @@ class Deal(tuple):
                     for card in hand_cards()]
         if max(Counter(predealt).values(), default=0) > 1:
             raise Exception("Same card dealt twice.")
-        if seat_smartstack:
-            seat, smartstack = seat_smartstack
-            smartstack._predealt = predealt
-            dealer[seat] = smartstack
-            dealer["_smartstack"] = seat
-        dealer["_remaining"] = sorted({*FULL_DECK} - {*predealt})
-        return functools.partial(cls, dealer)
-
-    def __new__(cls, dealer, accept_func=None, tries=1000):
+        # Hands are dealt as 52-bit masks (see `Hand.from_bits`): each seat
+        # receives the sum of its predealt cards' bits and of the bits of
+        # the first cards of the shuffled remaining cards.
+        dealer["_to_deal"] = [len(Rank) - len(dealer[seat]())
+                              if seat in dealer else 0
+                              for seat in Seat]
+        dealer["_predealt"] = [sum(map(_card_bit, dealer[seat]()))
+                               if seat in dealer else 0
+                               for seat in Seat]
+        if smartstacks:
+            dealer["_smartstack"] = (
+                list(smartstacks),
+                JointStack(list(smartstacks.values()), predealt))
+        dealer["_remaining"] = [
+            _card_bit(card) for card in sorted({*FULL_DECK} - {*predealt})]
+        return Dealer(cls, dealer)
+
+    def __new__(cls, dealer, accept_func=None, tries=1000, lazy=False):
         """
         Randomly deal a hand from a prepared dealer.
 
         *accept_func* can be a function similar to `Simulation.accept`:
         reshuffle until *accept_func* returns True, but no more than *tries*
         times.
+
+        If *lazy* is set, *accept_func* is passed a `LazyDeal`, whose hands
+        are only dealt when first accessed, which is faster when most deals
+        are rejected after looking at only some of the hands.  (The deals are
+        then different from those of the non-lazy mode, for a given seed.)
         """
+        if lazy and accept_func is not None:
+            for i in range(tries):
+                deal = LazyDeal(cls, dealer)
+                if accept_func(deal):
+                    return deal.force()
+            raise Exception(
+                "Could not generate any deal matching accept_func")
+        from_bits = Hand.from_bits
+        to_deal = dealer["_to_deal"]
         for i in range(tries):
-            hands = [None] * len(Seat)
+            bits = dealer["_predealt"]
             cards = dealer["_remaining"]
             try:
-                seat = dealer["_smartstack"]
+                seats, stack = dealer["_smartstack"]
             except KeyError:
                 pass
             else:
-                hands[seat] = hand = Hand(dealer[seat]())
-                cards = sorted({*cards} - {*hand.cards()})
+                bits = bits.copy()
+                stacked = 0
+                for seat, stack_cards in zip(seats, stack()):
+                    bits[seat] = hand_bits = Hand(stack_cards).bits
+                    stacked |= hand_bits
+                cards = [card for card in cards if not card & stacked]
             random.shuffle(cards)
-            for seat in Seat:
-                if hands[seat]:
-                    continue
-                pre = dealer[seat]()
-                to_deal = len(Rank) - len(pre)
-                hand, cards = pre + cards[:to_deal], cards[to_deal:]
-                hands[seat] = Hand(hand)
-            self = tuple.__new__(cls, hands)
+            n0 = to_deal[0]
+            n1 = n0 + to_deal[1]
+            n2 = n1 + to_deal[2]
+            self = tuple.__new__(cls, [
+                from_bits(bits[0] + sum(cards[:n0])),
+                from_bits(bits[1] + sum(cards[n0:n1])),
+                from_bits(bits[2] + sum(cards[n1:n2])),
+                from_bits(bits[3] + sum(cards[n2:])),
+            ])
             self._dd_cache = {}
             if accept_func is None or accept_func(self):
                 return self
         raise Exception("Could not generate any deal matching accept_func")
 
+    @classmethod
+    def from_masks(cls, masks):
+        """
+        Initialize with four hands' suit masks (see `Hand.from_masks`), e.g.
+        a row of the array returned by `Dealer.batch`.
+        """
+        self = tuple.__new__(cls, map(Hand.from_masks, masks))
+        self._dd_cache = {}
+        return self
+
+    @classmethod
+    def from_bits(cls, bits):
+        """
+        Initialize with four hands' 52-bit masks (see `Hand.from_bits`).
+        """
+        self = tuple.__new__(cls, map(Hand.from_bits, bits))
+        self._dd_cache = {}
+        return self
+
     def _short_str(self):
         """Return a one-line version of the deal."""
         return " ".join(self[hand]._short_str() for hand in self._print_only)
@@ -329,13 +401,42 @@ class Deal(tuple):
     south = property(itemgetter(Seat.S), "south")
     west = property(itemgetter(Seat.W), "west")
 
+    _unset = object()
+
+    @classmethod
+    def set_dd_cache(cls, maxsize=_unset, spots=_unset, path=_unset):
+        """
+        Configure the process-wide cache of double-dummy results.
+
+        At most *maxsize* results are kept in memory (0 disables the
+        in-memory cache).  If *spots* (a `Rank`) is not None, cards ranked
+        *spots* or lower are considered equivalent within each suit when
+        looking up results, which is an approximation (see `redeal.ddcache`).
+        If *path* is not None, results are also stored in (and looked up
+        from) a SQLite database at that path.
+
+        Settings that are not passed are left unchanged (initially, 2 ** 16,
+        None and None).
+        """
+        if spots is not cls._unset:
+            if spots != ddcache.cache.spots:
+                ddcache.cache.clear()
+            ddcache.cache.spots = spots
+        if maxsize is not cls._unset:
+            ddcache.cache.maxsize = maxsize
+        if path is not cls._unset:
+            ddcache.cache.path = path
+
     def dd_tricks(self, contract_declarer):
         """Compute declarer's number of double-dummy tricks in a contract."""
         strain = Contract.from_str(contract_declarer[:-1]).strain
         declarer = contract_declarer[-1]
         if (strain, declarer) not in self._dd_cache:
-            self._dd_cache[strain, declarer] = \
-                dds.solve(self, strain, declarer)
+            tricks = ddcache.cache.get_tricks(self, strain, declarer)
+            if tricks is None:
+                tricks = dds.solve(self, strain, declarer)
+                ddcache.cache.set_tricks(self, strain, declarer, tricks)
+            self._dd_cache[strain, declarer] = tricks
         return self._dd_cache[strain, declarer]
 
     def dd_score(self, contract_declarer, vul=False):
@@ -343,6 +444,56 @@ class Deal(tuple):
         return Contract.from_str(contract_declarer[:-1], vul=vul).score(
             self.dd_tricks(contract_declarer))
 
+    def dd_makes(self, contract_declarer, tricks=None):
+        """
+        Check whether declarer makes a contract double-dummy.
+
+        By default, the number of tricks needed is given by the contract's
+        level; it can be overridden with *tricks*.  This is much cheaper than
+        `dd_tricks` when the exact number of tricks is not cached yet, as DDS
+        can stop searching as soon as the answer is known.
+        """
+        contract = Contract.from_str(contract_declarer[:-1])
+        strain = contract.strain
+        declarer = contract_declarer[-1]
+        if tricks is None:
+            tricks = contract.level + 6
+        exact = self._dd_cache.get((strain, declarer))
+        if exact is None:
+            exact = ddcache.cache.get_tricks(self, strain, declarer)
+        if exact is not None:
+            self._dd_cache[strain, declarer] = exact
+            return exact >= tricks
+        key = strain, declarer, tricks
+        if key not in self._dd_cache:
+            self._dd_cache[key] = dds.makes(self, strain, declarer, tricks)
+        return self._dd_cache[key]
+
+    def dd_session(self):
+        """
+        Return a `dds.Session` for the deal, for consecutive queries that
+        reuse DDS's transposition table::
+
+            with deal.dd_session() as session:
+                leads = session.solve_all("S", "W")
+                makes = session.makes("S", "E", 10)
+        """
+        return dds.Session(self)
+
+    def dd_tricks_async(self, contract_declarer):
+        """
+        Like `dd_tricks`, but solve in the background.
+
+        Returns a `concurrent.futures.Future`, so that dealing can go on while
+        DDS solves; from a coroutine, use ``await
+        asyncio.wrap_future(deal.dd_tricks_async(...))``.
+        """
+        return dds.executor().submit(self.dd_tricks, contract_declarer)
+
+    def dd_score_async(self, contract_declarer, vul=False):
+        """Like `dd_score`, but solve in the background (see above)."""
+        return dds.executor().submit(self.dd_score, contract_declarer, vul)
+
     def dd_all_tricks(self, strain, leader):
         """
         Compute declarer's number of double dummy tricks for all leads.
@@ -350,22 +501,99 @@ class Deal(tuple):
         Cards for which the card immediately above is in the same hand are not
         listed; i.e., equivalent leads are only listed once.
         """
-        return dds.solve_all(self, strain, leader)
+        leads = ddcache.cache.get_leads(self, strain, leader)
+        if leads is None:
+            leads = dds.solve_all(self, strain, leader)
+            ddcache.cache.set_leads(self, strain, leader, leads)
+        return leads
 
-    def par(self, dealer, nsvul, ewvul):
+    def dd_table(self):
+        """
+        Compute the full double-dummy table of the deal.
+
+        Returns a ``(strain, declarer) -> tricks`` dict, and fills the deal's
+        cache so that later calls to `dd_tricks` and `dd_score` are free.  All
+        20 strain/declarer pairs are solved in a single DDS call, which is
+        several times faster than solving them independently.
+        """
+        table = self._cached_dd_table()
+        if table is None:
+            table = dds.calc_dd_table(self)
+            self._cache_dd_table(table)
+        return table
+
+    def _cached_dd_table(self):
+        """Return the double-dummy table if fully cached, or None."""
+        table = {}
+        for strain in Strain:
+            for declarer in Seat:
+                key = strain.name, declarer.name
+                try:
+                    table[strain, declarer] = self._dd_cache[key]
+                except KeyError:
+                    tricks = ddcache.cache.get_tricks(self, *key)
+                    if tricks is None:
+                        return None
+                    table[strain, declarer] = self._dd_cache[key] = tricks
+        return table
+
+    def _cache_dd_table(self, table):
+        """Fill the deal's and the process-wide caches from a table."""
+        for (strain, declarer), tricks in table.items():
+            key = strain.name, declarer.name
+            if key not in self._dd_cache:
+                self._dd_cache[key] = tricks
+                ddcache.cache.set_tricks(self, *key, tricks)
+
+    @staticmethod
+    def dd_tables(deals):
+        """
+        Compute the full double-dummy tables of many deals at once.
+
+        Returns, for each deal, a ``(strain, declarer) -> tricks`` dict, and
+        fills each deal's cache so that later calls to `dd_tricks` and
+        `dd_score` are free.  The deals are solved in batches by DDS, which is
+        much faster than solving them one strain at a time; deals whose table
+        is already cached (see `set_dd_cache`) are not solved again.
+        """
+        deals = [*deals]
+        tables = [deal._cached_dd_table() for deal in deals]
+        missing = [deal for deal, table in zip(deals, tables) if table is None]
+        solved = iter(dds.calc_all_tables(missing) if missing else [])
+        for i, deal in enumerate(deals):
+            if tables[i] is None:
+                tables[i] = next(solved)
+                deal._cache_dd_table(tables[i])
+        return tables
+
+    def par(self, dealer, nsvul, ewvul, native=False):
         """
         Compute the double dummy par for the given dealer and vulnerabilities.
 
         Returns a list of `ScoredContract` with the following attributes: the
         `.contract`, the `.declarer`, the number of `.tricks`, and the NS
         `.score`.
+
+        If *native* is set, the par contracts are computed by DDS instead of
+        by iterating over all possible contracts in Python.
         """
         bid_order = [Seat((Seat[dealer].value + k) % 4) for k in range(4)]
         vuls = {Seat.N: nsvul, Seat.S: nsvul, Seat.E: ewvul, Seat.W: ewvul}
         pars = [ScoredContract(None, None, None)]
-        tricks_lookup = {
-            (strain, declarer): self.dd_tricks(f"1{strain}{declarer.name}")
-            for strain in Strain for declarer in Seat}
+        tricks_lookup = self.dd_table()
+        if native:
+            # Sort the contracts in the order in which the loop below finds
+            # them (DDS lists tied strains in its own order).
+            return sorted(
+                (ScoredContract(
+                    Contract(level, strain.name, doubled, vuls[declarer]),
+                    declarer, tricks)
+                 for level, strain, doubled, declarers, tricks
+                 in dds.dealer_par(tricks_lookup, dealer, nsvul, ewvul)
+                 for declarer in declarers),
+                key=lambda sc: (sc.contract.level, Strain[sc.contract.strain],
+                                bid_order[::-1].index(sc.declarer))
+            ) or pars
         for level in range(1, 8):
             for strain in Strain:
                 for declarer in bid_order[::-1]:
@@ -387,6 +615,241 @@ class Deal(tuple):
         return pars
 
 
+class Dealer(functools.partial):
+    """
+    A prepared dealer, as returned by `Deal.prepare`.
+
+    Calling the dealer returns a random `Deal`, with the same arguments as
+    `Deal.__new__` (except for the dealer itself).
+    """
+
+    def batch(self, n):
+        """
+        Randomly deal *n* deals at once, as a NumPy array of suit masks.
+
+        The array has shape ``(n, 4, 4)`` and dtype uint16, and is indexed by
+        deal, seat and suit; `Deal.from_masks` converts a row back to a
+        `Deal`.  Deals are independent and uniformly distributed given the
+        predealt cards and the smartstacking constraints.
+
+        This requires NumPy.  The NumPy generator is seeded from the
+        `random` module, so that the batches are reproducible for a given
+        seed.
+        """
+        import numpy as np
+        dealer = self.args[0]
+        rng = np.random.default_rng(random.getrandbits(64))
+        shifts = np.arange(
+            0, len(Suit) * len(Rank), len(Rank), dtype=np.uint64)
+        # Shuffle each row of the remaining cards' bits independently, then
+        # give each seat the sum of its slice of each row.
+        cards = np.tile(np.array(dealer["_remaining"], np.uint64), (n, 1))
+        rng.permuted(cards, axis=1, out=cards)
+        if "_smartstack" in dealer:
+            seats, stack = dealer["_smartstack"]
+            stacked = (stack.sample(n, rng).astype(np.uint64)
+                       << shifts).sum(axis=2, dtype=np.uint64)
+            # Move the stacked cards to the end of each row, keeping the
+            # shuffled order of the others; smartstacked seats are not dealt
+            # any of the other cards.
+            taken = (cards & np.bitwise_or.reduce(stacked, axis=1)[:, None]
+                     ).astype(bool)
+            cards = np.take_along_axis(
+                cards, np.argsort(taken, axis=1, kind="stable"), axis=1)
+        bits = np.empty((n, len(Seat)), np.uint64)
+        start = 0
+        for seat in Seat:
+            stop = start + dealer["_to_deal"][seat]
+            bits[:, seat] = cards[:, start:stop].sum(axis=1, dtype=np.uint64)
+            bits[:, seat] += np.uint64(dealer["_predealt"][seat])
+            start = stop
+        if "_smartstack" in dealer:
+            bits[:, [seat.value for seat in seats]] = stacked
+        return ((bits[:, :, None] >> shifts) & np.uint64(0x1fff)).astype(
+            np.uint16)
+
+    def lazy(self):
+        """Randomly deal a `LazyDeal`."""
+        return LazyDeal(self.func, self.args[0])
+
+    def enumerate(self, spots=None):
+        """
+        Iterate over all the deals consistent with the predealt cards, as
+        ``(deal, weight)`` pairs, in combinatorial order.
+
+        If *spots* (a `Rank`) is given, the remaining cards of each suit that
+        are ranked *spots* or lower are considered equivalent: a single deal
+        is generated for each distribution of such cards, and its weight is
+        the number of deals it stands for.  Otherwise, all weights are 1.
+        """
+        cls = self.func
+        dealer = self.args[0]
+        if "_smartstack" in dealer:
+            raise Exception("Enumeration does not support SmartStack.")
+        to_deal = dealer["_to_deal"]
+        seats = [seat for seat in Seat if to_deal[seat]]
+        max_spot = spots.value - 2 if spots is not None else -1
+        high = []
+        lows = [[] for _ in Suit]  # Each suit's spots, highest first.
+        for card in dealer["_remaining"]:
+            suit, rank = divmod(card.bit_length() - 1, len(Rank))
+            if rank <= max_spot:
+                lows[suit].insert(0, card)
+            else:
+                high.append(card)
+
+        def make_deal(bits):
+            deal = tuple.__new__(cls, map(Hand.from_bits, bits))
+            deal._dd_cache = {}
+            return deal
+
+        def deal_seats(i, high, lows, bits, weight):
+            # Deal seats[i], then recurse; the last seat takes the rest.
+            if len(seats) - i <= 1:
+                if seats:
+                    bits = bits.copy()
+                    bits[seats[-1]] += sum(high) + sum(map(sum, lows))
+                yield make_deal(bits), weight
+                return
+            seat = seats[i]
+            n = to_deal[seat]
+            n_low = sum(map(len, lows))
+            rest_bits = sum(high) + sum(map(sum, lows))
+            for k in range(max(n - n_low, 0), min(n, len(high)) + 1):
+                for counts in _compositions(n - k, [*map(len, lows)]):
+                    low_bits = sum(sum(low[:count])
+                                   for low, count in zip(lows, counts))
+                    low_weight = weight
+                    for low, count in zip(lows, counts):
+                        low_weight *= _binomial(len(low), count)
+                    rest_lows = [low[count:]
+                                 for low, count in zip(lows, counts)]
+                    seat_bits = bits.copy()
+                    for chosen in combinations(high, k):
+                        chosen_bits = sum(chosen) + low_bits
+                        seat_bits[seat] = bits[seat] + chosen_bits
+                        if len(seats) - i == 2:  # Shortcut the recursion.
+                            last_bits = seat_bits.copy()
+                            last_bits[seats[-1]] += rest_bits - chosen_bits
+                            yield make_deal(last_bits), low_weight
+                        else:
+                            chosen_set = {*chosen}
+                            yield from deal_seats(
+                                i + 1,
+                                [card for card in high
+                                 if card not in chosen_set],
+                                rest_lows, seat_bits, low_weight)
+
+        return deal_seats(0, high, lows, dealer["_predealt"], 1)
+
+
+class LazyDeal:
+    """
+    A random deal whose hands are only dealt when first accessed.
+
+    Accessing a hand (``deal.north``, ``deal[Seat.N]``, etc.) only deals the
+    cards of that hand (and of the smartstacked hands, which are dealt
+    jointly, upfront).  Other attributes (``deal.dd_tricks``, etc.) are those
+    of the full `Deal`, which is built, dealing the remaining hands, on first
+    use, or by calling `force`.
+    """
+
+    def __init__(self, cls, dealer):
+        self._cls = cls
+        self._dealer = dealer
+        self._hands = [None] * len(Seat)
+        try:
+            seats, stack = dealer["_smartstack"]
+        except KeyError:
+            self._cards = dealer["_remaining"].copy()
+        else:
+            stacked = 0
+            for seat, stack_cards in zip(seats, stack()):
+                self._hands[seat] = hand = Hand(stack_cards)
+                stacked |= hand.bits
+            self._cards = [card for card in dealer["_remaining"]
+                           if not card & stacked]
+        self._n_dealt = 0  # The cards dealt so far are at the start of _cards.
+        self._deal = None
+
+    def __getitem__(self, seat):
+        hand = self._hands[seat]
+        if hand is None:
+            # Partial Fisher-Yates shuffle: move the seat's cards, chosen at
+            # random among the cards not dealt yet, to the start of the
+            # undealt cards.
+            cards = self._cards
+            start = self._n_dealt
+            stop = self._n_dealt = start + self._dealer["_to_deal"][seat]
+            n = len(cards)
+            rand = random.random
+            if stop < n:  # Otherwise, the seat gets all the undealt cards.
+                for i in range(start, stop):
+                    j = i + int(rand() * (n - i))
+                    cards[i], cards[j] = cards[j], cards[i]
+            hand = self._hands[seat] = Hand.from_bits(
+                self._dealer["_predealt"][seat] + sum(cards[start:stop]))
+        return hand
+
+    def __iter__(self):
+        return map(self.__getitem__, Seat)
+
+    def __len__(self):
+        return len(Seat)
+
+    north = property(lambda self: self[Seat.N], doc="North's hand.")
+    east = property(lambda self: self[Seat.E], doc="East's hand.")
+    south = property(lambda self: self[Seat.S], doc="South's hand.")
+    west = property(lambda self: self[Seat.W], doc="West's hand.")
+
+    def force(self):
+        """Deal the remaining hands, and return the full `Deal`."""
+        if self._deal is None:
+            self._deal = tuple.__new__(self._cls, self)
+            self._deal._dd_cache = {}
+        return self._deal
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.force(), name)
+
+    def __str__(self):
+        return str(self.force())
+
+    def __repr__(self):
+        return repr(self.force())
+
+    def __eq__(self, other):
+        return self.force() == other
+
+    def __hash__(self):
+        return hash(self.force())
+
+
+def _compositions(total, caps):
+    """
+    Iterate over the tuples of nonnegative integers summing to *total*,
+    bounded elementwise by *caps*.
+    """
+    if not caps:
+        if not total:
+            yield ()
+        return
+    for first in range(min(total, caps[0]) + 1):
+        if total - first <= sum(caps[1:]):
+            for rest in _compositions(total - first, caps[1:]):
+                yield (first, *rest)
+
+
+def _binomial(n, k):
+    """Return the binomial coefficient *n* choose *k*."""
+    result = 1
+    for i in range(min(k, n - k)):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
 class Hand(tuple):
     """A hand, represented as a tuple of holdings."""
 
@@ -394,10 +857,33 @@ class Hand(tuple):
         """Initialize with a sequence of :class:`Cards <Card>`."""
         if len(cards) > len(Rank):
             raise ValueError("More than {} cards in a hand".format(len(Rank)))
-        holdings = [[] for _ in Suit]
+        masks = [0 for _ in Suit]
         for card in cards:
-            holdings[card.suit].append(card)
-        return tuple.__new__(cls, map(Holding, holdings))
+            masks[card.suit] |= 1 << (card.rank.value - 2)
+        return cls.from_masks(masks)
+
+    @classmethod
+    def from_masks(cls, masks):
+        """
+        Initialize with four 13-bit masks, one per suit (spades first).
+
+        Bit #i of a mask is set if the card of rank ``Rank(i + 2)`` is held.
+        """
+        return tuple.__new__(cls, map(Holding._by_mask.__getitem__, masks))
+
+    @classmethod
+    def from_bits(cls, bits):
+        """
+        Initialize with a 52-bit mask, the concatenation of the suit masks.
+
+        Bits #0 to #12 are the spade mask, bits #13 to #25 the heart mask,
+        etc.
+        """
+        by_mask = Holding._by_mask
+        return tuple.__new__(cls, (by_mask[bits & 0x1fff],
+                                   by_mask[bits >> 13 & 0x1fff],
+                                   by_mask[bits >> 26 & 0x1fff],
+                                   by_mask[bits >> 39]))
 
     @classmethod
     def from_str(cls, init):
@@ -444,10 +930,18 @@ class Hand(tuple):
     def __contains__(self, other):
         """Specialize the case of checking for containing a :class:`Card`."""
         if isinstance(other, Card):
-            return other.rank in self[other.suit]
+            return bool(self[other.suit].mask >> (other.rank.value - 2) & 1)
         else:
             return tuple.__contains__(self, other)
 
+    masks = util.reify(
+        lambda self: tuple(holding.mask for holding in self),
+        "The hand's suit masks (see `from_masks`).", "masks")
+    bits = util.reify(
+        lambda self: (self[0].mask | self[1].mask << 13
+                      | self[2].mask << 26 | self[3].mask << 39),
+        "The hand's 52-bit mask (see `from_bits`).", "bits")
+
     spades = util.reify(
         itemgetter(Suit.S), "The hand's spades.", "spades")
     hearts = util.reify(
@@ -461,23 +955,17 @@ class Hand(tuple):
         lambda self: tuple(map(len, self)),
         "The hand's shape.")
     hcp = util.reify(
-        lambda self, _hcp=attrgetter("hcp"): sum(map(_hcp, self)),
-        "The hand's HCP count.")
+        lambda self: hcp(self), "The hand's HCP count.", "hcp")
     qp = util.reify(
-        lambda self, _qp=attrgetter("qp"): sum(map(_qp, self)),
-        "The hand's QP count.")
+        lambda self: qp(self), "The hand's QP count.", "qp")
     controls = util.reify(
-        lambda self, _controls=attrgetter("controls"): sum(map(_controls, self)),
-        "The hand's control count.")
+        lambda self: controls(self), "The hand's control count.", "controls")
     losers = util.reify(
-        lambda self, _losers=attrgetter("losers"): sum(map(_losers, self)),
-        "The hand's loser count.")
+        lambda self: _losers(self), "The hand's loser count.", "losers")
     newltc = util.reify(
-        lambda self, _newltc=attrgetter("newltc"): sum(map(_newltc, self)),
-        "The hand's loser count.")
+        lambda self: _newltc(self), "The hand's loser count.", "newltc")
     pt = util.reify(
-        lambda self, _pt=attrgetter("pt"): sum(map(_pt, self)),
-        "The hand's playing tricks.")
+        lambda self: _pt(self), "The hand's playing tricks.", "pt")
 
     # Compatibility with Deal.
     l1 = util.reify(lambda self: sorted(map(len, self))[3],
@@ -504,11 +992,27 @@ A, K, Q, J, T = (Rank[rank] for rank in "AKQJT")
 
 
 class Holding(frozenset):
-    """A one-suit holding, represented as a frozenset of card ranks."""
+    """
+    A one-suit holding, represented as a frozenset of card ranks.
+
+    Holdings are interned: each of the 8192 possible holdings is represented
+    by a single instance, whose :attr:`mask` has bit #i set if the card of
+    rank ``Rank(i + 2)`` is held.  Thus, the holdings' reified attributes
+    (:attr:`hcp`, :attr:`losers`, etc.) are only computed once per holding.
+    """
 
     def __new__(cls, cards):
         """Initialize with a sequence of :class:`Cards <Card>`."""
-        return frozenset.__new__(cls, (card.rank for card in cards))
+        return cls._by_mask[
+            sum({1 << (card.rank.value - 2) for card in cards})]
+
+    @classmethod
+    def from_mask(cls, mask):
+        """Initialize with a 13-bit mask."""
+        return cls._by_mask[mask]
+
+    def __reduce__(self):
+        return Holding.from_mask, (self.mask,)
 
     def __str__(self):
         return "".join(rank.name for rank in sorted(self, reverse=True))
@@ -520,12 +1024,14 @@ class Holding(frozenset):
     @util.reify
     def losers(self):
         """The holding's loser count."""
-        return (
-            (len(self) >= 1 and A not in self)
-            + (len(self) >= 2 and K not in self)
-            + (len(self) >= 3 and (
-                (Q not in self)
-                or (losers == 2 and J not in self and T not in self) / 2)))
+        losers = (len(self) >= 1 and A not in self) + (
+            len(self) >= 2 and K not in self)
+        if len(self) >= 3:
+            if Q not in self:
+                losers += 1
+            elif losers == 2 and J not in self and T not in self:
+                losers += .5
+        return losers
 
     @util.reify
     def newltc(self):  # For compatibility with Deal.
@@ -570,6 +1076,33 @@ class Holding(frozenset):
         return len_pt
 
 
+Holding._by_mask = [frozenset.__new__(Holding)]
+Holding._by_mask[0].mask = 0
+for _rank in Rank:
+    # Holdings with the rank as highest card extend lower holdings.
+    for _lower in Holding._by_mask[:]:
+        _holding = frozenset.__new__(Holding, [*_lower, _rank])
+        _holding.mask = _lower.mask | 1 << (_rank.value - 2)
+        Holding._by_mask.append(_holding)
+del _rank, _lower, _holding
+
+# Also compile the holding metrics that are not additive over cards.
+_losers = Evaluator.from_func(Holding.losers.wrapped)
+_losers.__name__ = "losers"
+Holding.losers = util.reify(_losers, Holding.losers.__doc__)
+_newltc = Evaluator.from_func(Holding.newltc.wrapped)
+_newltc.__name__ = "newltc"
+Holding.newltc = util.reify(_newltc, Holding.newltc.__doc__)
+_pt = Evaluator.from_func(Holding.pt.wrapped)
+_pt.__name__ = "pt"
+Holding.pt = util.reify(_pt, Holding.pt.__doc__)
+
+
+def _card_bit(card):
+    """Return the bit of a card in a 52-bit hand mask."""
+    return 1 << (len(Rank) * card.suit.value + card.rank.value - 2)
+
+
 class Contract:
     def __init__(self, level, strain, doubled=0, vul=False):
         if not (1 <= level <= 7 and hasattr(Strain, strain) and
@@ -686,6 +1219,19 @@ class Simulation:
     def final(self, n_tries):
         print(f"Tries: {n_tries}")
 
+    def result(self):
+        """
+        Return the (picklable) result of the deals processed so far.
+
+        When deals are processed by several worker processes, the result of
+        each worker is passed to the main simulation's `merge` before `final`
+        is called.
+        """
+        return None
+
+    def merge(self, result):
+        """Merge the `result` of a worker into this simulation."""
+
 
 class OpeningLeadSim(Simulation):
     def __init__(self, accept, contract_declarer, scoring):
@@ -703,12 +1249,19 @@ class OpeningLeadSim(Simulation):
                    reverse=True),
             self.scoring)
 
-    def do(self, deal):
-        self.payoff.add_data(deal.dd_all_tricks(self.strain, self.leader))
+    def do(self, deal, weight=1):
+        self.payoff.add_data(deal.dd_all_tricks(self.strain, self.leader),
+                             weight)
 
     def final(self, n_tries):
         self.payoff.report()
 
+    def result(self):
+        return self.payoff
+
+    def merge(self, result):
+        self.payoff.merge(result)
+
 
 class Payoff:
     """A payoff table for comparing multiple strategies."""
@@ -719,21 +1272,54 @@ class Payoff:
         """
         self.entries = entries
         self.diff = diff
-        self.table = [[[] for _0 in entries] for _1 in entries]
-
-    def add_data(self, raw_scores):
-        """Add a realization of the scores as a strategy -> raw scores dict."""
+        # Running mean and sum of squared deviations from the mean (following
+        # Welford's algorithm) of the differences, for each pair of entries.
+        self.count = 0
+        self.means = [[0 for _0 in entries] for _1 in entries]
+        self.m2s = [[0 for _0 in entries] for _1 in entries]
+
+    def __getstate__(self):
+        # The difference function is often a lambda, which cannot be pickled;
+        # it is not needed to merge or report tables anyways.
+        return {**vars(self), "diff": None}
+
+    def add_data(self, raw_scores, weight=1):
+        """
+        Add a realization of the scores as a strategy -> raw scores dict,
+        counted *weight* times (see `Dealer.enumerate`).
+        """
+        self.count += weight
         for i, ei in enumerate(self.entries):
             for j, ej in enumerate(self.entries):
-                self.table[i][j].append(
-                    self.diff(raw_scores[ei], raw_scores[ej]))
+                diff = self.diff(raw_scores[ei], raw_scores[ej])
+                delta = diff - self.means[i][j]
+                self.means[i][j] += delta * weight / self.count
+                self.m2s[i][j] += weight * delta * (diff - self.means[i][j])
+
+    def merge(self, other):
+        """Merge the data of another payoff table with the same entries."""
+        if list(other.entries) != list(self.entries):
+            raise ValueError("Cannot merge payoff tables with different "
+                             "entries.")
+        if not other.count:
+            return
+        count = self.count + other.count
+        for i in range(len(self.entries)):
+            for j in range(len(self.entries)):
+                delta = other.means[i][j] - self.means[i][j]
+                self.means[i][j] += delta * other.count / count
+                self.m2s[i][j] += (other.m2s[i][j]
+                                   + delta ** 2 * self.count * other.count
+                                   / count)
+        self.count = count
 
     def report(self):
         """Pretty-print a payoff table."""
-        means_stderrs = [[(statistics.mean(score),
-                           statistics.stdev(score) / len(score) ** (1/2))
-                          for score in line]
-                         for line in self.table]
+        means_stderrs = [[(mean,
+                           (m2 / (self.count - 1) / self.count) ** (1/2)
+                           if self.count > 1 else float("nan"))
+                          for mean, m2 in zip(means, m2s)]
+                         for means, m2s in zip(self.means, self.m2s)]
         print(
             "\t" + "".join(f"{entry:.7}\t" for entry in self.entries))
         for i, (entry, line) in enumerate(zip(self.entries, means_stderrs)):
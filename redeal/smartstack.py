@@ -1,14 +1,27 @@
 from bisect import bisect
 from collections import Counter
+from fractions import Fraction
 from functools import reduce
-from itertools import combinations, product
+from itertools import product
+import hashlib
+import math
 import operator
+import os
+import pickle
 import random
+import tempfile
 
 from .global_defs import Card, Rank, Suit
 
 
 class SmartStack:
+    # Prepared tables are cached in this directory (set to None to disable
+    # caching), keyed by a hash of everything they depend on.
+    cache_dir = os.environ.get("REDEAL_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "redeal")
+    _cache_version = 2
+
     def __init__(self, shape, evaluator, values, predealt=None):
         self._shape = shape
         self._evaluator = evaluator
@@ -17,34 +30,81 @@ class SmartStack:
         self._prepared = False
 
     def _prepare(self):
+        from .redeal import Evaluator
+        self._prepared = True
+        self._backtracking = {}
+        # Evaluate holdings by table lookup, tabulating plain functions first.
+        table = (self._evaluator.table
+                 if isinstance(self._evaluator, Evaluator)
+                 else Evaluator.from_func(self._evaluator).table)
+        key = self._cache_key(table)
+        path = _cache_path(
+            self.cache_dir if key is not None else None,
+            (self._cache_version, key,
+             sorted(map(str, self._predealt or ()))))
+        cached = _load_cache(path)
+        if cached is not None:
+            self.holdings, self.totals, self.patterns, self.cumsum = cached
+            self.total = self.cumsum[-1]
+            return
+        self._compute(table)
+        _store_cache(path, self.cache_dir,
+                     (self.holdings, self.totals, self.patterns, self.cumsum))
+
+    def _cache_key(self, table):
+        """
+        Return what the tables depend on, except for the predealt cards, or
+        None if the allowed values cannot be listed (and the tables must not be
+        cached).
+        """
+        try:
+            values = sorted(self._values)
+        except TypeError:  # Not iterable, e.g. a custom container.
+            return None
+        return (self._shape._table.tobytes(),
+                self._shape.min_ls, self._shape.max_ls, table, values)
+
+    def _compute(self, table):
         # holdings[i][l, v]:
         #     OK holdings for suit #i such that len(h) = l, eval_holding(h) = v
-        self._prepared = True
+        from .redeal import Holding
         by_suit = {suit: {card.rank for card in (self._predealt or {})
                           if card.suit == suit}
                    for suit in Suit}
         holdings = [{} for _ in Suit]
-        for l in range(len(Rank)):
-            for holding in map(frozenset, combinations(Rank, l)):
-                v = self._evaluator(holding)
-                for suit in Suit:
-                    if (self._shape.min_ls[suit] <= len(holding)
-                            <= self._shape.max_ls[suit]
-                            and not holding & by_suit[suit]):
-                        holdings[suit].setdefault((l, v), []).append(holding)
-        counter = Counter()
-        for lvs_hs in product(*[holdings[suit].items() for suit in Suit]):
-            lvs, hs = zip(*lvs_hs)
-            ls, vs = zip(*lvs)
-            if (sum(ls) == len(Rank)
-                    and ls in self._shape
-                    and sum(vs) in self._values):
-                counter[ls, vs] += reduce(operator.mul, map(len, hs))
+        for holding in Holding._by_mask:
+            l = len(holding)
+            v = _round(table[holding.mask])
+            for suit in Suit:
+                if (self._shape.min_ls[suit] <= l <= self._shape.max_ls[suit]
+                        and not holding & by_suit[suit]):
+                    holdings[suit].setdefault((l, v), []).append(holding)
+        # totals[i][ls, v]: number of combinations of holdings for suits #0
+        # to #i, of lengths ls (a prefix of an accepted shape) and total
+        # value v, computed by convolving the suits one at a time.
+        shapes = [shape for shape, ok
+                  in zip(self._shape._all_shapes, self._shape._table) if ok]
+        totals = []
+        prev = {((), 0): 1}
+        for suit in Suit:
+            prefixes = {shape[:suit.value + 1] for shape in shapes}
+            total = Counter()
+            for (ls, v), n in prev.items():
+                for (l, w), hs in holdings[suit].items():
+                    if ls + (l,) in prefixes:
+                        total[ls + (l,), _round(v + w)] += n * len(hs)
+            totals.append(total)
+            prev = total
+        counter = {(ls, v): n for (ls, v), n in prev.items()
+                   if v in self._values}
+        if not counter:
+            raise Exception("No hands satisfy the smartstacking constraints.")
         patterns, cumsum = zip(*counter.items())
         cumsum = list(cumsum)
         for i in range(1, len(cumsum)):
             cumsum[i] += cumsum[i - 1]
         self.holdings = holdings
+        self.totals = totals
         self.patterns = patterns
         self.cumsum = cumsum
         self.total = cumsum[-1]
@@ -52,8 +112,588 @@ class SmartStack:
     def __call__(self):
         if not self._prepared:
             self._prepare()
-        lvs = zip(*self.patterns[bisect(self.cumsum,
-                                        random.randint(0, self.total - 1))])
-        hand = [random.choice(holdings[ls, vs])
-                for holdings, (ls, vs) in zip(self.holdings, lvs)]
-        return [Card(suit, rank) for suit in Suit for rank in hand[suit]]
+        ls, v = self.patterns[bisect(self.cumsum,
+                                     random.randint(0, self.total - 1))]
+        # Backtrack from the last suit, drawing each suit's value given the
+        # remaining total.
+        hand = [None] * len(Suit)
+        for i in range(len(Suit) - 1, 0, -1):
+            choices, cumsum = self._transitions_to(i, ls, v)
+            w, hs = choices[bisect(cumsum, random.randint(0, cumsum[-1] - 1))]
+            hand[i] = random.choice(hs)
+            v = _round(v - w)
+        hand[0] = random.choice(self.holdings[0][ls[0], v])
+        return [Card(suit, rank)
+                for suit, holding in zip(Suit, hand) for rank in holding]
+
+    def _transitions_to(self, suit, ls, v):
+        """
+        Return (and cache) the ways to reach the key ``(ls[:suit + 1], v)`` of
+        ``totals[suit]``, as a list of ``(w, holdings)`` (the suit's value and
+        holdings) and the cumulative sum of their counts.
+        """
+        try:
+            return self._backtracking[suit, ls[:suit + 1], v]
+        except KeyError:
+            pass
+        prev = self.totals[suit - 1]
+        choices, cumsum = [], []
+        total = 0
+        for (l, w), hs in self.holdings[suit].items():
+            if l == ls[suit]:
+                n = prev.get((ls[:suit], _round(v - w)))
+                if n:
+                    total += len(hs) * n
+                    choices.append((w, hs))
+                    cumsum.append(total)
+        self._backtracking[suit, ls[:suit + 1], v] = choices, cumsum
+        return choices, cumsum
+
+    def sample(self, n, rng=None):
+        """
+        Draw *n* hands at once, as a NumPy array of suit masks.
+
+        The array has shape ``(n, 4)`` and dtype uint16 (see `Hand.masks`).
+        This requires NumPy; *rng* is a NumPy generator, by default seeded
+        from the `random` module.
+        """
+        import numpy as np
+        if not self._prepared:
+            self._prepare()
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+        tables = self._sample_tables()
+        masks = np.empty((n, len(Suit)), np.uint16)
+        # Draw the final states, then backtrack through the suits as in
+        # __call__: draw a transition (i.e. a bucket of holdings for the
+        # suit, and a previous state), then a holding in the bucket.
+        states = tables["final"][np.searchsorted(
+            tables["cumsum"], rng.integers(0, self.total, n), "right")]
+        for suit in reversed(Suit):
+            if suit.value:
+                cumsum, starts, counts, buckets, prevs = tables[suit]
+                transitions = np.searchsorted(
+                    cumsum, starts[states] + rng.integers(0, counts[states]),
+                    "right")
+                bucket = buckets[transitions]
+                states = prevs[transitions]
+            else:
+                bucket = states
+            flat, bucket_starts, bucket_sizes = tables["buckets", suit]
+            masks[:, suit] = flat[bucket_starts[bucket]
+                                  + rng.integers(0, bucket_sizes[bucket])]
+        return masks
+
+    def _sample_tables(self):
+        """Return (and cache) the transition tables used by `sample`."""
+        import numpy as np
+        try:
+            return self._sample_tables_cache
+        except AttributeError:
+            pass
+        tables = {}
+        bucket_ids = []
+        for suit in Suit:
+            # The buckets of suit #0 are indexed as the states of level #0.
+            keys = ([(ls[0], v) for ls, v in self.totals[0]] if not suit.value
+                    else list(self.holdings[suit]))
+            holdings = [self.holdings[suit][key] for key in keys]
+            sizes = np.array([len(hs) for hs in holdings], np.int64)
+            tables["buckets", suit] = (
+                np.array([h.mask for hs in holdings for h in hs], np.uint16),
+                np.cumsum(sizes) - sizes, sizes)
+            bucket_ids.append({key: i for i, key in enumerate(keys)})
+        state_ids = [{key: i for i, key in enumerate(totals)}
+                     for totals in self.totals]
+        for suit in list(Suit)[1:]:
+            i = suit.value
+            prev_totals = self.totals[i - 1]
+            cumsum, starts, buckets, prevs = [], [], [], []
+            total = 0
+            for ls, v in self.totals[i]:
+                starts.append(total)
+                for (l, w), hs in self.holdings[suit].items():
+                    prev = ls[:i], _round(v - w)
+                    if l == ls[i] and prev in prev_totals:
+                        total += len(hs) * prev_totals[prev]
+                        cumsum.append(total)
+                        buckets.append(bucket_ids[i][l, w])
+                        prevs.append(state_ids[i - 1][prev])
+            starts = np.array(starts, np.int64)
+            tables[suit] = (np.array(cumsum, np.int64), starts,
+                            np.diff(starts, append=total),
+                            np.array(buckets, np.intp),
+                            np.array(prevs, np.intp))
+        tables["final"] = np.array(
+            [state_ids[-1][pattern] for pattern in self.patterns], np.intp)
+        tables["cumsum"] = np.array(self.cumsum, np.int64)
+        self._sample_tables_cache = tables
+        return tables
+
+
+class JointStack:
+    """
+    Smartstacking of several seats at once.
+
+    Each seat is constrained by its own `SmartStack`; the hands are dealt
+    uniformly among the combinations of hands that satisfy all constraints
+    simultaneously and do not contain any predealt card.  `Deal.prepare`
+    creates a `JointStack` for the smartstacked seats; a single seat is
+    directly dealt by its `SmartStack`.
+
+    Prepared tables are cached as those of `SmartStack` (see
+    `SmartStack.cache_dir`).
+    """
+
+    _cache_version = 1
+
+    def __init__(self, smartstacks, predealt=None):
+        self._smartstacks = smartstacks
+        self._predealt = predealt
+        if len(smartstacks) == 1:
+            smartstacks[0]._predealt = predealt
+        self._prepared = False
+
+    def _prepare(self):
+        from .redeal import Evaluator
+        self._prepared = True
+        stacks = self._smartstacks
+        tables = [
+            stack._evaluator.table if isinstance(stack._evaluator, Evaluator)
+            else Evaluator.from_func(stack._evaluator).table
+            for stack in stacks]
+        keys = [stack._cache_key(table)
+                for stack, table in zip(stacks, tables)]
+        cache_dir = SmartStack.cache_dir if None not in keys else None
+        path = _cache_path(
+            cache_dir,
+            (self._cache_version, keys,
+             sorted(map(str, self._predealt or ()))))
+        cached = _load_cache(path)
+        if cached is not None:
+            (self.holdings, self.counts, self.transitions, self.totals,
+             self.finals, self.cumsum, self._scale, self._width) = cached
+        else:
+            self._compute(tables)
+            _store_cache(path, cache_dir,
+                         (self.holdings, self.counts, self.transitions,
+                          self.totals, self.finals, self.cumsum,
+                          self._scale, self._width))
+        self.total = self.cumsum[-1]
+        # inverse[suit][i][state]: the (previous state, length) pairs leading
+        # to *state* for seat #i.
+        self._inverse = []
+        for suit in Suit:
+            inverse = []
+            for transitions in self.transitions:
+                seat_inverse = {}
+                for prev, table in enumerate(transitions[suit]):
+                    for l, state in table.items():
+                        seat_inverse.setdefault(state, []).append((prev, l))
+                inverse.append(seat_inverse)
+            self._inverse.append(inverse)
+        self._backtracking = {}
+
+    def _compute(self, tables):
+        from .redeal import Holding
+        stacks = self._smartstacks
+        # Values are handled as integers (multiplied by a common denominator,
+        # which is exact for floats), and the seats' values as single
+        # integers (see `_pack`), so that they can be summed quickly.
+        denominators = {Fraction(value).denominator
+                        for table in tables for value in table}
+        self._scale = reduce(
+            lambda a, b: a * b // math.gcd(a, b), denominators, 1)
+        if self._scale != 1:
+            tables = [[int(Fraction(value) * self._scale) for value in table]
+                      for table in tables]
+        self._tables = tables
+        self._width = (
+            2 * len(Suit) * max(abs(value) for table in tables
+                                for value in table) + 1)
+        # For each suit, counts[suit][ls][vs] is the number of tuples of
+        # disjoint holdings (one per seat) of lengths ls and (packed) values
+        # vs, and holdings[suit][i][l, v] the holdings of seat #i of length l
+        # and value v.
+        lengths = [len(holding) for holding in Holding._by_mask]
+        additive = all(map(_is_additive, tables))
+        self.counts = []
+        self.holdings = []
+        suit_counts = {}
+        # Bounds on the values of each seat (and of their sum) in each suit.
+        value_bounds = []
+        for suit in Suit:
+            taken = sum(1 << (card.rank.value - 2)
+                        for card in (self._predealt or {})
+                        if card.suit == suit)
+            bounds = tuple(
+                (stack._shape.min_ls[suit], stack._shape.max_ls[suit])
+                for stack in stacks)
+            if (taken, bounds) not in suit_counts:
+                counts = (self._count_suit_by_rank(taken, bounds) if additive
+                          else self._count_suit(lengths, taken, bounds))
+                suit_vs = [(*vs, sum(vs)) for values in counts.values()
+                           for vs in values]
+                suit_counts[taken, bounds] = (
+                    {ls: {self._pack(vs): n for vs, n in values.items()}
+                     for ls, values in counts.items()},
+                    ([*map(min, zip(*suit_vs))], [*map(max, zip(*suit_vs))])
+                    if suit_vs else None)
+            counts, suit_bounds = suit_counts[taken, bounds]
+            if not counts:
+                raise Exception(
+                    "No hands satisfy the smartstacking constraints.")
+            self.counts.append(counts)
+            value_bounds.append(suit_bounds)
+            holdings = [{} for _ in stacks]
+            for mask, l in enumerate(lengths):
+                if mask & taken:
+                    continue
+                for i, (lo, hi) in enumerate(bounds):
+                    if lo <= l <= hi:
+                        holdings[i].setdefault(
+                            (l, tables[i][mask]), []).append(mask)
+            self.holdings.append(holdings)
+        # totals[suit][states, vs]: number of combinations of holdings for
+        # suits #0 to #suit, such that each seat's lengths lead to its state
+        # in states (see `_shape_automaton`) and the seats' (packed) total
+        # values are vs, computed by convolving the suits one at a time.
+        # Totals that cannot be completed to acceptable ones are dropped.
+        self.transitions = [_shape_automaton(stack._shape) for stack in stacks]
+        if not all(self.transitions):
+            raise Exception("No hands satisfy the smartstacking constraints.")
+        # The acceptable totals of each seat are those of its own tables
+        # (which also handle non-iterable containers of values).
+        accepted = []
+        for stack in stacks:
+            if not stack._prepared:
+                stack._prepare()
+            accepted.append({v for _, v in stack.patterns})
+        lows = [min(values) * self._scale for values in accepted]
+        highs = [max(values) * self._scale for values in accepted]
+        n_seats = len(stacks)
+
+        def completable(vs, rest_mins, rest_maxs):
+            # Whether the remaining suits can bring the totals within bounds.
+            return (all(lo - rest_max <= v <= hi - rest_min
+                        for v, lo, hi, rest_min, rest_max
+                        in zip(vs, lows, highs, rest_mins, rest_maxs))
+                    and sum(lows) - sum(vs) <= rest_maxs[-1]
+                    and sum(highs) - sum(vs) >= rest_mins[-1])
+
+        def acceptable(vs):
+            return all(self._unscale(v) in values
+                       for v, values in zip(vs, accepted))
+
+        self.totals = []
+        prev = {((0,) * n_seats, 0): 1}
+        for suit in Suit:
+            by_states = {}
+            for (states, vs), n in prev.items():
+                by_states.setdefault(states, {})[vs] = n
+            total = {}
+            for states, prev_values in by_states.items():
+                seat_transitions = [
+                    transitions[suit][state]
+                    for transitions, state in zip(self.transitions, states)]
+                for ls, values in self.counts[suit].items():
+                    try:
+                        next_states = tuple(
+                            table[l] for table, l
+                            in zip(seat_transitions, ls))
+                    except KeyError:
+                        continue
+                    next_values = total.setdefault(next_states, {})
+                    for vs, n in prev_values.items():
+                        for suit_vs, m in values.items():
+                            key = vs + suit_vs
+                            next_values[key] = (
+                                next_values.get(key, 0) + n * m)
+            rest_mins = [sum(mins) for mins in zip(
+                [0] * (n_seats + 1),
+                *(mins for mins, _ in value_bounds[suit.value + 1:]))]
+            rest_maxs = [sum(maxs) for maxs in zip(
+                [0] * (n_seats + 1),
+                *(maxs for _, maxs in value_bounds[suit.value + 1:]))]
+            last = suit.value == len(Suit) - 1
+            prev = {}
+            for states, values in total.items():
+                for key, n in values.items():
+                    vs = self._unpack(key)
+                    if (acceptable(vs) if last
+                            else completable(vs, rest_mins, rest_maxs)):
+                        prev[states, key] = n
+            self.totals.append(prev)
+        if not prev:
+            raise Exception("No hands satisfy the smartstacking constraints.")
+        finals, cumsum = zip(*prev.items())
+        cumsum = list(cumsum)
+        for i in range(1, len(cumsum)):
+            cumsum[i] += cumsum[i - 1]
+        self.finals = finals
+        self.cumsum = cumsum
+
+    def _pack(self, vs):
+        """Pack the seats' values into a single integer."""
+        return sum(v * self._width ** i for i, v in enumerate(vs))
+
+    def _unpack(self, key):
+        """Unpack the seats' values from a single integer."""
+        half = self._width // 2
+        vs = []
+        for _ in self._smartstacks:
+            v = (key + half) % self._width - half
+            vs.append(v)
+            key = (key - v) // self._width
+        return vs
+
+    def _unscale(self, value):
+        """Return a seat's total value, as given by its evaluator."""
+        return value if self._scale == 1 else _round(value / self._scale)
+
+    def _count_suit(self, lengths, taken, bounds):
+        """
+        Count the tuples of disjoint holdings avoiding *taken*, with lengths
+        within *bounds*, by lengths and values.
+
+        This enumerates the tuples, and is thus slow for more than two seats;
+        `_count_suit_by_rank` is used instead for additive evaluators.
+        """
+        tables = self._tables
+        last_lo, last_hi = bounds[-1]
+        last_table = tables[-1]
+        last_counts = {}
+
+        def count_last(avail):
+            # Histogram of the last seat's holdings (subsets of *avail*).
+            try:
+                return last_counts[avail]
+            except KeyError:
+                counter = Counter()
+                sub = avail
+                while True:
+                    if last_lo <= lengths[sub] <= last_hi:
+                        counter[lengths[sub], last_table[sub]] += 1
+                    if not sub:
+                        break
+                    sub = (sub - 1) & avail
+                last_counts[avail] = counter
+                return counter
+
+        counts = {}
+
+        def count(i, avail, ls, vs):
+            if i == len(bounds) - 1:
+                for (l, v), n in count_last(avail).items():
+                    values = counts.setdefault(ls + (l,), Counter())
+                    values[vs + (v,)] += n
+                return
+            lo, hi = bounds[i]
+            table = tables[i]
+            sub = avail
+            while True:
+                if lo <= lengths[sub] <= hi:
+                    count(i + 1, avail & ~sub,
+                          ls + (lengths[sub],), vs + (table[sub],))
+                if not sub:
+                    break
+                sub = (sub - 1) & avail
+
+        count(0, (1 << len(Rank)) - 1 & ~taken, (), ())
+        return counts
+
+    def _count_suit_by_rank(self, taken, bounds):
+        """
+        Like `_count_suit`, for additive evaluators (see `_is_additive`):
+        give the suit's ranks one at a time to one of the seats, or to none.
+        """
+        zero = (0,) * len(bounds)
+        states = {(zero, zero): 1}
+        for rank in range(len(Rank)):
+            if taken & (1 << rank):
+                continue
+            new_states = dict(states)  # The rank is given to no seat.
+            for (ls, vs), n in states.items():
+                for i, (_, hi) in enumerate(bounds):
+                    if ls[i] < hi:
+                        key = (ls[:i] + (ls[i] + 1,) + ls[i + 1:],
+                               vs[:i] + (vs[i] + self._tables[i][1 << rank],)
+                               + vs[i + 1:])
+                        new_states[key] = new_states.get(key, 0) + n
+            states = new_states
+        counts = {}
+        for (ls, vs), n in states.items():
+            if all(lo <= l for l, (lo, _) in zip(ls, bounds)):
+                counts.setdefault(ls, Counter())[vs] += n
+        return counts
+
+    def _transitions_to(self, suit, key):
+        """
+        Return (and cache) the ways to reach a key of ``totals[suit]``, as a
+        list of ``(ls, vs, previous key)`` (where *ls* and *vs* are the
+        suit's lengths and packed values) and the cumulative sum of their
+        counts.
+        """
+        try:
+            return self._backtracking[suit, key]
+        except KeyError:
+            pass
+        states, vs = key
+        prev_totals = (self.totals[suit - 1] if suit
+                       else {((0,) * len(self._smartstacks), 0): 1})
+        choices, cumsum = [], []
+        total = 0
+        for prevs in product(*(
+                inverse[state]
+                for inverse, state in zip(self._inverse[suit], states))):
+            prev_states, ls = zip(*prevs)
+            for suit_vs, m in self.counts[suit].get(ls, {}).items():
+                prev = prev_states, vs - suit_vs
+                n = prev_totals.get(prev)
+                if n:
+                    total += n * m
+                    choices.append((ls, suit_vs, prev))
+                    cumsum.append(total)
+        self._backtracking[suit, key] = choices, cumsum
+        return choices, cumsum
+
+    def __call__(self):
+        """Deal the smartstacked hands, as one list of cards per seat."""
+        if len(self._smartstacks) == 1:
+            return [self._smartstacks[0]()]
+        if not self._prepared:
+            self._prepare()
+        # Draw the final key, then the suits' lengths and values from the
+        # last suit down.
+        key = self.finals[bisect(self.cumsum,
+                                 random.randint(0, self.total - 1))]
+        patterns = [None] * len(Suit)
+        for suit in reversed(Suit):
+            choices, cumsum = self._transitions_to(suit.value, key)
+            ls, vs, key = choices[bisect(cumsum,
+                                         random.randint(0, cumsum[-1] - 1))]
+            patterns[suit] = ls, self._unpack(vs)
+        # Independently drawn holdings are uniformly distributed among
+        # disjoint ones if overlapping draws are rejected.
+        hands = [[] for _ in self._smartstacks]
+        for suit, (ls, vs) in zip(Suit, patterns):
+            candidates = [holdings[l, v] for holdings, l, v
+                          in zip(self.holdings[suit], ls, vs)]
+            while True:
+                masks = [random.choice(c) for c in candidates]
+                if sum(masks) == reduce(operator.or_, masks):
+                    break
+            for hand, mask in zip(hands, masks):
+                hand.extend(Card(suit, Rank(i + 2)) for i in range(len(Rank))
+                            if mask & (1 << i))
+        return hands
+
+    def sample(self, n, rng=None):
+        """
+        Deal *n* times the smartstacked hands, as a NumPy array of suit masks.
+
+        The array has shape ``(n, number of seats, 4)`` and dtype uint16.  A
+        single seat is sampled by `SmartStack.sample`; otherwise, the hands
+        are dealt one at a time.
+        """
+        import numpy as np
+        if len(self._smartstacks) == 1:
+            return self._smartstacks[0].sample(n, rng)[:, None]
+        from .redeal import Hand
+        return np.array([[Hand(cards).masks for cards in self()]
+                         for _ in range(n)], np.uint16).reshape(
+                             (n, len(self._smartstacks), len(Suit)))
+
+
+def _shape_automaton(shape):
+    """
+    Return the minimal automaton reading the suit lengths of the accepted
+    shapes of *shape*, one suit at a time, as a list of per-suit transition
+    tables: ``transitions[suit][state]`` maps the suit's length to the next
+    state, if the lengths read so far are a prefix of an accepted shape.
+
+    Each state stands for the prefixes that can be completed by the same
+    lengths (e.g., for any shape, a state per total length), which keeps the
+    tables small.  The initial and final states are 0; if no shape is
+    accepted, the tables are empty.
+    """
+    shapes = [shape for shape, ok
+              in zip(shape._all_shapes, shape._table) if ok]
+    if not shapes:
+        return []
+    states = {shape: 0 for shape in shapes}
+    transitions = []
+    for suit in reversed(Suit):
+        by_prefix = {}
+        for prefix, state in states.items():
+            by_prefix.setdefault(
+                prefix[:suit.value], {})[prefix[suit.value]] = state
+        ids = {}
+        tables = []
+        states = {}
+        for prefix, table in by_prefix.items():
+            key = tuple(sorted(table.items()))
+            if key not in ids:
+                ids[key] = len(tables)
+                tables.append(table)
+            states[prefix] = ids[key]
+        transitions.append(tables)
+    transitions.reverse()
+    return transitions
+
+
+def _is_additive(table):
+    """
+    Return whether an evaluator's table (see `Evaluator.table`) has integer
+    values, and is the sum of the values of the holdings' ranks.
+    """
+    return (table[0] == 0
+            and all(isinstance(value, int) for value in table)
+            and all(table[mask] == table[mask & (mask - 1)]
+                    + table[mask & -mask]
+                    for mask in range(1, len(table))))
+
+
+def _cache_path(cache_dir, key):
+    """
+    Return the path of the cache file for *key*, or None if caching is off.
+    """
+    if cache_dir is None:
+        return None
+    return os.path.join(
+        cache_dir,
+        "smartstack-{}.pickle".format(
+            hashlib.sha256(repr(key).encode()).hexdigest()))
+
+
+def _load_cache(path):
+    """Load a cache file, returning None if it is missing or unusable."""
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    except Exception:  # Missing, corrupted or stale cache.
+        return None
+
+
+def _store_cache(path, cache_dir, data):
+    """Atomically write a cache file, if caching is on."""
+    if path is None:
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:  # E.g., read-only cache directory.
+        pass
+
+
+def _round(value):
+    """
+    Round float values, so that totals do not depend on the order in which
+    they are summed.
+    """
+    return round(value, 9) if isinstance(value, float) else value